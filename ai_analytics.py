@@ -4,7 +4,12 @@ from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 from statsmodels.tsa.arima.model import ARIMA
 from textblob import TextBlob
-import yfinance as yf
+from data_context import DataContext
+from model_pool import DEFAULT_FIT_TIMEOUT, run_model_fits
+from metrics import get_metrics
+from arima_cache import get_arima_cache
+from arima_orders import FALLBACK_ORDER, get_arima_order_cache
+from news_cache import get_sentiment_cache
 from datetime import datetime, timedelta
 import colorama
 from colorama import Fore, Style
@@ -12,16 +17,30 @@ from colorama import Fore, Style
 # Initialize colorama
 colorama.init()
 
-def predict_next_day(ticker_symbol, days=1):
+# Columns fed to the next-day regression, in order
+PREDICTION_FEATURES = ['Open', 'High', 'Low', 'Close', 'Volume', 'Return']
+
+def predict_next_day(ticker_symbol, days=1, context=None):
     """
     Predict the next day's price movement using Linear Regression
     Returns the predicted price and confidence score
     """
     try:
-        # Get historical data for the past 30 days
-        ticker = yf.Ticker(ticker_symbol)
-        hist = ticker.history(period="60d")
-        
+        # Get historical data for the past 60 days from the shared context
+        context = context or DataContext()
+        hist = context.history(ticker_symbol, 60)
+        with get_metrics().span("regression", ticker_symbol):
+            return fit_next_day_model(hist)
+    
+    except Exception as e:
+        return None, None, str(e)
+
+def fit_next_day_model(hist):
+    """
+    Fit the next-day regression on a window of daily bars
+    Kept free of I/O so it can run in a worker process
+    """
+    try:
         if hist.empty or len(hist) < 30:
             return None, None, "Insufficient data"
         
@@ -36,7 +55,7 @@ def predict_next_day(ticker_symbol, days=1):
             return None, None, "Insufficient data after processing"
         
         # Features
-        features = ['Open', 'High', 'Low', 'Close', 'Volume', 'Return']
+        features = PREDICTION_FEATURES
         X = df[features].values
         y = df['Target'].values
         
@@ -65,25 +84,121 @@ def predict_next_day(ticker_symbol, days=1):
     except Exception as e:
         return None, None, str(e)
 
-def get_arima_forecast(ticker_symbol, days=5):
+def _next_day_features(hist):
+    """Build the regression features and target with NumPy, matching fit_next_day_model"""
+    ohlcv = hist[PREDICTION_FEATURES[:5]].to_numpy(dtype=float)
+    close = ohlcv[:, 3]
+    returns = np.full(len(close), np.nan)
+    returns[1:] = (close[1:] - close[:-1]) / close[:-1]
+    target = np.full(len(close), np.nan)
+    target[:-1] = returns[1:]
+    X = np.column_stack([ohlcv, returns])
+    keep = ~(np.isnan(X).any(axis=1) | np.isnan(target))
+    return X[keep], target[keep]
+
+def batch_predict_next_day(histories):
+    """
+    Vectorized version of fit_next_day_model for many tickers at once
+    Tickers with the same number of rows are stacked into one (tickers, rows, features)
+    array and all standardized least-squares fits and R² scores are solved together.
+    Returns {ticker: (predicted_price, confidence, error)}
+    """
+    results = {}
+    groups = {}
+    for ticker, hist in histories.items():
+        if hist.empty or len(hist) < 30:
+            results[ticker] = (None, None, "Insufficient data")
+            continue
+        X, y = _next_day_features(hist)
+        if len(X) < 20:
+            results[ticker] = (None, None, "Insufficient data after processing")
+            continue
+        groups.setdefault(len(X), []).append((ticker, X, y))
+
+    for members in groups.values():
+        tickers = [ticker for ticker, _, _ in members]
+        X = np.stack([m[1] for m in members])
+        y = np.stack([m[2] for m in members])
+        mean, std, coef, intercept, r2 = standardized_ols(X, y)
+        
+        prediction = ((X[:, -1] - mean[:, 0]) / std[:, 0] * coef).sum(axis=1) + intercept
+        current_price = X[:, -1, 3]
+        predicted_price = current_price * (1 + prediction)
+        for i, ticker in enumerate(tickers):
+            results[ticker] = (predicted_price[i], r2[i], None)
+
+    return results
+
+def standardized_ols(X, y):
+    """
+    Standardized least-squares fits of a stack of (rows, features) windows, as fit_next_day_model does for one
+    Returns the feature mean and std per window, the coefficients on the standardized features, the intercepts and R²
+    """
+    # Standardize like StandardScaler (population std, zero variance left unscaled)
+    mean = X.mean(axis=1, keepdims=True)
+    std = X.std(axis=1, keepdims=True)
+    std[std == 0] = 1.0
+    X_scaled = (X - mean) / std
+    
+    # Ordinary least squares with intercept, minimum-norm like LinearRegression
+    y_mean = y.mean(axis=1, keepdims=True)
+    X_centered = X_scaled - X_scaled.mean(axis=1, keepdims=True)
+    coef = np.linalg.pinv(X_centered) @ (y - y_mean)[..., None]
+    intercept = y_mean[:, 0] - (X_scaled.mean(axis=1)[:, None, :] @ coef)[:, 0, 0]
+    
+    fitted = (X_scaled @ coef)[..., 0] + intercept[:, None]
+    ss_res = ((y - fitted) ** 2).sum(axis=1)
+    ss_tot = ((y - y_mean) ** 2).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.where(ss_res == 0, 1.0, 0.0))
+    return mean, std, coef[..., 0], intercept, r2
+
+def get_arima_forecast(ticker_symbol, days=5, context=None):
     """
     Use ARIMA model to forecast price trend for the next few days
     """
     try:
-        # Get historical data
-        ticker = yf.Ticker(ticker_symbol)
-        hist = ticker.history(period="120d")
+        # Get historical data from the shared context
+        context = context or DataContext()
+        hist = context.history(ticker_symbol, 120)
         
         if hist.empty or len(hist) < 60:
             return None, "Insufficient data"
         
         # Prepare data - use closing prices
         close_prices = hist['Close'].values
+        timestamps = hist.index.asi8
         
-        # Fit ARIMA model - using a simple (5,1,0) model
-        # In a production app, we would use auto_arima to find optimal parameters
-        model = ARIMA(close_prices, order=(5, 1, 0))
-        model_fit = model.fit()
+        # Each ticker's order comes from a periodic grid search; the cached model is reused when no new bar has arrived
+        order = get_arima_order_cache().order(ticker_symbol, close_prices)
+        cache = get_arima_cache()
+        key = (ticker_symbol, order, days)
+        mode, value = cache.plan(key, timestamps)
+        if mode == "cached":
+            return value, None
+        
+        with get_metrics().span("arima", ticker_symbol):
+            trend_pct, params, error = fit_arima_model(close_prices, days, params=value, order=order)
+        if error is None:
+            cache.store(key, timestamps, params, trend_pct, refit=(mode == "refit"))
+        return trend_pct, error
+    
+    except Exception as e:
+        return None, str(e)
+
+def fit_arima_model(close_prices, days=5, params=None, order=FALLBACK_ORDER):
+    """
+    Fit ARIMA on closing prices and return the forecast trend in percent with the model parameters
+    When params are given the filter state is updated with them instead of running a full fit
+    Kept free of I/O so it can run in a worker process
+    """
+    try:
+        # Fit the ARIMA model with the ticker's selected order
+        model = ARIMA(close_prices, order=order)
+        if params is not None:
+            model_fit = model.filter(params)
+        else:
+            model_fit = model.fit()
         
         # Forecast
         forecast = model_fit.forecast(steps=days)
@@ -93,39 +208,37 @@ def get_arima_forecast(ticker_symbol, days=5):
         forecast_end_price = forecast[-1]
         trend_pct = ((forecast_end_price - current_price) / current_price) * 100
         
-        return trend_pct, None
+        return trend_pct, np.asarray(model_fit.params), None
     
     except Exception as e:
-        return None, str(e)
+        return None, None, str(e)
 
-def analyze_market_news(ticker_symbol):
+def score_headlines(headlines):
+    """Score a batch of headlines with TextBlob polarity"""
+    return [TextBlob(headline).sentiment.polarity for headline in headlines]
+
+def analyze_market_news(ticker_symbol, context=None):
     """
     Analyze recent news sentiment for a given ticker
     """
     try:
-        ticker = yf.Ticker(ticker_symbol)
-        news = ticker.news
+        context = context or DataContext()
+        news = context.news(ticker_symbol)
         
         if not news:
             return 0, 0, []
         
         # Get the 5 most recent news items
-        recent_news = news[:5]
-        
-        sentiments = []
-        headlines = []
+        recent_news = [item for item in news[:5] if item.get('title', '')]
         
-        for item in recent_news:
-            headline = item.get('title', '')
-            if headline:
-                analysis = TextBlob(headline)
-                sentiment = analysis.sentiment.polarity
-                sentiments.append(sentiment)
-                headlines.append({
-                    'headline': headline,
-                    'sentiment': sentiment,
-                    'date': datetime.fromtimestamp(item.get('providerPublishTime', 0))
-                })
+        # Only headlines not scored before go through TextBlob
+        with get_metrics().span("sentiment", ticker_symbol):
+            sentiments = get_sentiment_cache().score_many([item['title'] for item in recent_news], score_headlines)
+        headlines = [{
+            'headline': item['title'],
+            'sentiment': sentiment,
+            'date': datetime.fromtimestamp(item.get('providerPublishTime', 0))
+        } for item, sentiment in zip(recent_news, sentiments)]
         
         if not sentiments:
             return 0, 0, []
@@ -138,11 +251,32 @@ def analyze_market_news(ticker_symbol):
     except Exception as e:
         return 0, 0, []
 
-def get_ai_insights(data):
+def get_ai_insights(data, context=None, fit_timeout=DEFAULT_FIT_TIMEOUT):
     """
     Generate AI insights for each market index
+    All stages read from one data context, so each ticker's history and news are fetched once per refresh.
+    Next-day regressions are solved for all tickers in one vectorized batch;
+    ARIMA fits run in a process pool and are applied as they finish.
     """
+    insights = [None] * len(data)
+    for position, insight in iter_ai_insights(data, context, fit_timeout):
+        insights[position] = insight
+    return insights
+
+def iter_ai_insights(data, context=None, fit_timeout=DEFAULT_FIT_TIMEOUT):
+    """
+    Streaming form of get_ai_insights
+    Yields (position in data, insight) for each index as soon as all of its stages are done,
+    so rows can be displayed while slower ARIMA fits are still running.
+    """
+    if context is None:
+        context = DataContext().prefetch([idx["ticker"] for idx in data if idx.get("ticker")])
+    arima_cache = get_arima_cache()
+    order_cache = get_arima_order_cache()
+    arima_plans = {}
+    prediction_windows = {}
     insights = []
+    tasks = []
     
     for idx in data:
         country = idx["country"]
@@ -156,28 +290,26 @@ def get_ai_insights(data):
             "percentage_change": idx["percentage_change"],
         }
         
-        # Price prediction
         if ticker:
-            pred_price, confidence, error = predict_next_day(ticker)
-            if pred_price is not None and confidence is not None:
-                pred_change = ((pred_price - idx["current_value"]) / idx["current_value"]) * 100
-                insight["prediction"] = {
-                    "next_day_value": round(pred_price, 2),
-                    "predicted_change": round(pred_change, 2),
-                    "confidence": round(confidence * 100, 1)
-                }
+            # Price predictions are solved for all tickers in one batch below
+            prediction_windows[len(insights)] = context.history(ticker, 60)
             
-            # Trend analysis
-            trend_pct, trend_error = get_arima_forecast(ticker)
-            if trend_pct is not None:
-                insight["trend"] = {
-                    "direction": "up" if trend_pct > 0 else "down",
-                    "strength": abs(trend_pct),
-                    "forecast": round(trend_pct, 2)
-                }
+            # Trend analysis is fitted in worker processes
+            hist = context.history(ticker, 120)
+            if len(hist) >= 60:
+                timestamps = hist.index.asi8
+                close_prices = hist['Close'].values
+                order = order_cache.order(ticker, close_prices)
+                arima_key = (ticker, order, 5)
+                mode, value = arima_cache.plan(arima_key, timestamps)
+                if mode == "cached":
+                    insight["trend"] = _trend_insight(value)
+                else:
+                    arima_plans[len(insights)] = (arima_key, timestamps, mode)
+                    tasks.append((len(insights), fit_arima_model, (close_prices, 5, value, order)))
             
             # News sentiment
-            sentiment, strength, headlines = analyze_market_news(ticker)
+            sentiment, strength, headlines = analyze_market_news(ticker, context=context)
             if headlines:
                 insight["sentiment"] = {
                     "score": round(sentiment, 2),
@@ -187,7 +319,41 @@ def get_ai_insights(data):
         
         insights.append(insight)
     
-    return insights
+    with get_metrics().span("regression"):
+        predictions = batch_predict_next_day(prediction_windows)
+    for position, (pred_price, confidence, error) in predictions.items():
+        if pred_price is not None and confidence is not None:
+            insight = insights[position]
+            pred_change = ((pred_price - insight["current_value"]) / insight["current_value"]) * 100
+            insight["prediction"] = {
+                "next_day_value": round(pred_price, 2),
+                "predicted_change": round(pred_change, 2),
+                "confidence": round(confidence * 100, 1)
+            }
+    get_sentiment_cache().save()
+    
+    # Indices without a pending ARIMA fit are complete already
+    for position, insight in enumerate(insights):
+        if position not in arima_plans:
+            yield position, insight
+    
+    labels = {position: plan[0][0] for position, plan in arima_plans.items()}
+    for position, result, error in run_model_fits(tasks, timeout=fit_timeout, stage="arima", labels=labels):
+        insight = insights[position]
+        if error is None:
+            trend_pct, params, trend_error = result
+            if trend_pct is not None:
+                arima_key, timestamps, mode = arima_plans[position]
+                arima_cache.store(arima_key, timestamps, params, trend_pct, refit=(mode == "refit"))
+                insight["trend"] = _trend_insight(trend_pct)
+        yield position, insight
+
+def _trend_insight(trend_pct):
+    return {
+        "direction": "up" if trend_pct > 0 else "down",
+        "strength": abs(trend_pct),
+        "forecast": round(trend_pct, 2)
+    }
 
 def format_prediction(prediction):
     """Format the prediction with color coding"""
@@ -234,33 +400,46 @@ def format_sentiment(sentiment):
     else:
         return f"{Style.BRIGHT}{Fore.RED}Very Negative{Style.RESET_ALL} ({score})"
 
-def display_ai_insights(insights):
-    """Display AI insights in a formatted table"""
-    print(f"\n{Fore.CYAN}{Style.BRIGHT}AI MARKET INSIGHTS{Style.RESET_ALL}")
-    print(f"{Fore.YELLOW}{'Country':<10} {'Index':<20} {'Current':<10} {'Change':<10} {'Prediction':<25} {'Trend':<25} {'Sentiment':<20}{Style.RESET_ALL}")
-    print("-" * 120)
+def ai_insights_header_rows():
+    return [
+        "",
+        f"{Fore.CYAN}{Style.BRIGHT}AI MARKET INSIGHTS{Style.RESET_ALL}",
+        f"{Fore.YELLOW}{'Country':<10} {'Index':<20} {'Current':<10} {'Change':<10} {'Prediction':<25} {'Trend':<25} {'Sentiment':<20}{Style.RESET_ALL}",
+        "-" * 120,
+    ]
+
+def ai_insights_footer_rows():
+    return [
+        "-" * 120,
+        f"{Fore.YELLOW}Note: Predictions are based on historical data and should not be used as financial advice.{Style.RESET_ALL}",
+    ]
+
+def insight_row_cells(insight):
+    """
+    Cells of one row of the AI insights table
+    Indices whose models are still running (insight["pending"]) show '...' in the AI columns
+    """
+    country = insight["country"]
+    index_name = insight["index_name"]
+    current = insight["current_value"]
+    change = insight["percentage_change"]
     
-    for insight in insights:
-        country = insight["country"]
-        index_name = insight["index_name"]
-        current = insight["current_value"]
-        change = insight["percentage_change"]
-        
-        # Format the change with color
-        if change >= 0:
-            change_str = f"{Fore.GREEN}+{change}%{Style.RESET_ALL}"
-        else:
-            change_str = f"{Fore.RED}{change}%{Style.RESET_ALL}"
-        
-        # Get prediction, trend and sentiment
+    # Format the change with color
+    if change >= 0:
+        change_str = f"{Fore.GREEN}+{change}%{Style.RESET_ALL}"
+    else:
+        change_str = f"{Fore.RED}{change}%{Style.RESET_ALL}"
+    
+    # Get prediction, trend and sentiment
+    if insight.get("pending"):
+        prediction = trend = sentiment = "..."
+    else:
         prediction = format_prediction(insight.get("prediction", {}))
         trend = format_trend(insight.get("trend", {}))
         sentiment = format_sentiment(insight.get("sentiment", {}))
-        
-        print(f"{country:<10} {index_name:<20} {current:<10} {change_str:<10} {prediction:<25} {trend:<25} {sentiment:<20}")
     
-    print("-" * 120)
-    print(f"{Fore.YELLOW}Note: Predictions are based on historical data and should not be used as financial advice.{Style.RESET_ALL}")
+    return (f"{country:<10}", f"{index_name:<20}", f"{current:<10}", f"{change_str:<10}",
+            f"{prediction:<25}", f"{trend:<25}", f"{sentiment:<20}")
 
 def generate_market_summary(insights):
     """Generate a natural language summary of market conditions"""
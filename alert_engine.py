@@ -0,0 +1,310 @@
+import bisect
+import csv
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import deque, namedtuple
+
+# Rule kinds: "above" fires when the change rises to the threshold, "below" when it
+# falls to it, and "move" when its absolute value reaches it (the classic alert)
+KINDS = ("above", "below", "move")
+
+# Rule target that matches every symbol
+ALL = "*"
+
+# Id of the rule that mirrors the global alert threshold setting
+THRESHOLD_RULE = "threshold"
+
+# Fired alerts kept for display
+DEFAULT_RECENT_ALERTS = 10
+
+
+def _directed(kind, change):
+    """Map a change onto the axis a rule of this kind triggers upwards on"""
+    if kind == "below":
+        return -change
+    if kind == "move":
+        return abs(change)
+    return change
+
+
+class Rule:
+    """
+    One alert rule for a symbol, a group or every symbol (target "*").
+    Once fired it stays quiet until the change moves back past the threshold by
+    `hysteresis` percentage points, and it never fires twice within `cooldown` seconds.
+    """
+
+    __slots__ = ("rule_id", "target", "kind", "threshold", "hysteresis", "cooldown")
+
+    def __init__(self, rule_id, target, kind, threshold, hysteresis=0.0, cooldown=0.0):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown rule kind: {kind} (use one of {', '.join(KINDS)})")
+        if hysteresis < 0 or cooldown < 0:
+            raise ValueError("Hysteresis and cooldown must not be negative")
+        self.rule_id = rule_id
+        self.target = target
+        self.kind = kind
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+
+    @property
+    def level(self):
+        """Trigger level on the rule's directed axis"""
+        return -self.threshold if self.kind == "below" else self.threshold
+
+    @property
+    def rearm_level(self):
+        """The rule re-arms once the directed change drops below this level"""
+        return self.level - self.hysteresis
+
+
+class _ThresholdIndex:
+    """Rules for one target and kind, sorted by trigger level and by re-arm level"""
+
+    __slots__ = ("rules", "levels", "by_level", "rearm_levels", "by_rearm", "dirty")
+
+    def __init__(self):
+        self.rules = {}
+        self.dirty = True
+
+    def _build(self):
+        self.by_level = sorted(self.rules.values(), key=lambda rule: rule.level)
+        self.levels = [rule.level for rule in self.by_level]
+        self.by_rearm = sorted(self.rules.values(), key=lambda rule: rule.rearm_level)
+        self.rearm_levels = [rule.rearm_level for rule in self.by_rearm]
+        self.dirty = False
+
+    def triggered(self, old, new):
+        """Rules whose level was crossed on the way up from old to new"""
+        if self.dirty:
+            self._build()
+        return self.by_level[bisect.bisect_right(self.levels, old):bisect.bisect_right(self.levels, new)]
+
+    def rearmed(self, new, old):
+        """Rules whose re-arm level was crossed on the way down from old to new"""
+        if self.dirty:
+            self._build()
+        return self.by_rearm[bisect.bisect_right(self.rearm_levels, new):bisect.bisect_right(self.rearm_levels, old)]
+
+
+class Alert(namedtuple("Alert", "rule_id symbol name kind threshold change time")):
+    """A fired rule"""
+
+    def message(self):
+        if self.kind == "above":
+            return f'[ALERT]: {self.name} ({self.symbol}) rose to {self.change}% (above {self.threshold}%)'
+        if self.kind == "below":
+            return f'[ALERT]: {self.name} ({self.symbol}) fell to {self.change}% (below {self.threshold}%)'
+        return f'[ALERT]: {self.name} ({self.symbol}) changed by {self.change}%! (Threshold: {self.threshold}%)'
+
+    def to_dict(self):
+        return dict(self._asdict(), message=self.message())
+
+
+class FileSink:
+    """Appends every alert as a JSON line to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, alerts):
+        with self.lock, open(self.path, "a") as f:
+            for alert in alerts:
+                f.write(json.dumps(alert.to_dict()) + "\n")
+
+
+class WebhookSink:
+    """POSTs each batch of alerts as a JSON list to a (local) HTTP endpoint"""
+
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts):
+        body = json.dumps([alert.to_dict() for alert in alerts]).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class AlertEngine:
+    """
+    Stateful alert evaluation.
+    Rules are indexed per (target, kind) in sorted threshold lists, so a refresh
+    only looks at symbols whose change moved and, for each of them, bisects to
+    the rules whose threshold lies between the old and the new value. A rule
+    fires once per crossing and symbol; identical alerts from overlapping symbol
+    and group rules are reported once.
+    """
+
+    def __init__(self, sinks=(), recent=DEFAULT_RECENT_ALERTS, clock=time.time):
+        self.sinks = list(sinks)
+        self.recent = deque(maxlen=recent)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.rules = {}
+        self.indexes = {}
+        self.groups = {}
+        self.last = {}
+        self.disarmed = set()
+        self.last_fired = {}
+        self.fired = 0
+        self.suppressed = 0
+        self.sink_errors = 0
+
+    def add_rule(self, rule):
+        with self.lock:
+            self._remove(rule.rule_id)
+            self.rules[rule.rule_id] = rule
+            index = self.indexes.setdefault((rule.target, rule.kind), _ThresholdIndex())
+            index.rules[rule.rule_id] = rule
+            index.dirty = True
+            # A new rule starts armed; symbols already past it fire on their next move
+            self.last.clear()
+
+    def add_rules(self, rules):
+        for rule in rules:
+            self.add_rule(rule)
+
+    def remove_rule(self, rule_id):
+        with self.lock:
+            self._remove(rule_id)
+
+    def _remove(self, rule_id):
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return
+        index = self.indexes[(rule.target, rule.kind)]
+        del index.rules[rule_id]
+        index.dirty = True
+        self.disarmed = {state for state in self.disarmed if state[0] != rule_id}
+        self.last_fired = {state: t for state, t in self.last_fired.items() if state[0] != rule_id}
+
+    def set_threshold(self, threshold):
+        """Keep the rule for the global alert threshold in line with the settings"""
+        rule = self.rules.get(THRESHOLD_RULE)
+        if rule is None or rule.threshold != threshold:
+            self.add_rule(Rule(THRESHOLD_RULE, ALL, "move", threshold))
+
+    def set_groups(self, membership):
+        """Set the groups each symbol belongs to, as {symbol: [group, ...]}"""
+        with self.lock:
+            self.groups = {symbol: tuple(groups) for symbol, groups in membership.items()}
+            self.last.clear()
+
+    def evaluate(self, snapshot, now=None):
+        """Check a Snapshot against every rule and return (and deliver) the alerts that fired"""
+        now = self.clock() if now is None else now
+        alerts = []
+        with self.lock:
+            for symbol, name, change in zip(snapshot.keys, snapshot.names, snapshot.change.tolist()):
+                old = self.last.get(symbol)
+                if old == change:
+                    continue
+                self.last[symbol] = change
+                seen = set()
+                for target in (symbol,) + self.groups.get(symbol, ()) + (ALL,):
+                    for kind in KINDS:
+                        index = self.indexes.get((target, kind))
+                        if index is None:
+                            continue
+                        new_value = _directed(kind, change)
+                        if old is None:
+                            # First sighting: settle the re-arm state, then fire everything already past its level
+                            for rule in index.rearmed(new_value, float("inf")):
+                                self.disarmed.discard((rule.rule_id, symbol))
+                            old_value = float("-inf")
+                        else:
+                            old_value = _directed(kind, old)
+                        if new_value < old_value:
+                            for rule in index.rearmed(new_value, old_value):
+                                self.disarmed.discard((rule.rule_id, symbol))
+                            continue
+                        for rule in index.triggered(old_value, new_value):
+                            alert = self._fire(rule, symbol, name, change, now, seen)
+                            if alert:
+                                alerts.append(alert)
+            self.recent.extend(alerts)
+        if alerts:
+            self._deliver(alerts)
+        return alerts
+
+    def _fire(self, rule, symbol, name, change, now, seen):
+        state = (rule.rule_id, symbol)
+        if state in self.disarmed:
+            return None
+        if now - self.last_fired.get(state, float("-inf")) < rule.cooldown:
+            self.suppressed += 1
+            return None
+        self.disarmed.add(state)
+        self.last_fired[state] = now
+        if (rule.kind, rule.threshold) in seen:
+            return None
+        seen.add((rule.kind, rule.threshold))
+        self.fired += 1
+        return Alert(rule.rule_id, symbol, name, rule.kind, rule.threshold, change, now)
+
+    def _deliver(self, alerts):
+        for sink in self.sinks:
+            try:
+                sink.send(alerts)
+            except Exception:
+                # A broken sink must not stop the refresh or the other sinks
+                self.sink_errors += 1
+
+    def recent_messages(self):
+        """Messages of the most recently fired alerts, newest first"""
+        with self.lock:
+            return [alert.message() for alert in reversed(self.recent)]
+
+
+def load_rules(path):
+    """
+    Load alert rules from a CSV or YAML file.
+    Each rule needs a `threshold`; `target` (a watchlist key, ticker, exchange or "*",
+    the default), `kind` (above, below or move, the default), `hysteresis`,
+    `cooldown` (seconds) and `id` are optional.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="") as f:
+            rows = [row for row in csv.DictReader(f) if any((value or "").strip() for value in row.values())]
+    elif extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("YAML alert rules need PyYAML (pip install pyyaml)")
+        with open(path) as f:
+            rows = yaml.safe_load(f) or []
+    else:
+        raise ValueError(f"Unsupported alert rules format: {path} (use .csv, .yaml or .yml)")
+
+    rules = []
+    for row in rows:
+        row = {name: str(value).strip() for name, value in row.items() if value not in (None, "")}
+        if "threshold" not in row:
+            raise ValueError(f"{path}: every alert rule needs a threshold")
+        target = row.get("target", ALL)
+        kind = row.get("kind", "move")
+        threshold = float(row["threshold"])
+        rules.append(Rule(row.get("id") or f"{target}:{kind}:{threshold:g}", target, kind, threshold,
+                          float(row.get("hysteresis", 0)), float(row.get("cooldown", 0))))
+    return rules
+
+
+def set_alert_engine(engine):
+    """Replace the process-wide alert engine"""
+    get_alert_engine.instance = engine
+    return engine
+
+
+def get_alert_engine():
+    """Get the process-wide alert engine"""
+    if not hasattr(get_alert_engine, "instance"):
+        get_alert_engine.instance = AlertEngine()
+    return get_alert_engine.instance
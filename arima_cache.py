@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Tickers kept before the least recently used model is evicted
+DEFAULT_MAX_MODELS = 256
+
+# New bars absorbed with a state update before a full refit is forced
+DEFAULT_REFIT_EVERY = 20
+
+
+class ArimaModelCache:
+    """
+    Fitted ARIMA parameters per ticker, keyed by the last bar they have seen.
+    Between bars the cached forecast is reused as is; when new bars arrive the
+    filter state is updated with the stored parameters, and a full MLE refit
+    only happens every `refit_every` bars. Least recently used entries are
+    evicted once `max_models` is exceeded.
+    """
+
+    def __init__(self, max_models=DEFAULT_MAX_MODELS, refit_every=DEFAULT_REFIT_EVERY):
+        self.max_models = max_models
+        self.refit_every = refit_every
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.updates = 0
+        self.refits = 0
+
+    def plan(self, key, timestamps):
+        """
+        Decide how to produce a forecast for a series ending at timestamps[-1].
+        Returns ("cached", trend_pct), ("update", params) or ("refit", None).
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return "refit", None
+            self.entries.move_to_end(key)
+            if entry["last_ts"] == timestamps[-1]:
+                self.hits += 1
+                return "cached", entry["trend"]
+            new_bars = int(np.count_nonzero(np.asarray(timestamps) > entry["last_ts"]))
+            if new_bars == 0 or entry["bars_since_refit"] + new_bars >= self.refit_every:
+                return "refit", None
+            return "update", entry["params"]
+
+    def store(self, key, timestamps, params, trend, refit):
+        """Record the result of an update or refit"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if refit or entry is None:
+                bars_since_refit = 0
+                self.refits += 1
+            else:
+                new_bars = int(np.count_nonzero(np.asarray(timestamps) > entry["last_ts"]))
+                bars_since_refit = entry["bars_since_refit"] + new_bars
+                self.updates += 1
+            self.entries[key] = {
+                "last_ts": timestamps[-1],
+                "params": params,
+                "trend": trend,
+                "bars_since_refit": bars_since_refit,
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_models:
+                self.entries.popitem(last=False)
+
+
+def get_arima_cache():
+    """Get the process-wide ARIMA model cache"""
+    if not hasattr(get_arima_cache, "instance"):
+        get_arima_cache.instance = ArimaModelCache()
+    return get_arima_cache.instance
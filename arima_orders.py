@@ -0,0 +1,230 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from model_pool import run_model_fits, stop_pool
+from utils import get_cache_dir
+
+# Order used for a ticker until its own order has been selected
+FALLBACK_ORDER = (5, 1, 0)
+
+# Bounds of the (p, q) grid searched for each ticker. d stays fixed: AIC and BIC are
+# likelihoods of the differenced series, so models with different d are not comparable
+DEFAULT_MAX_P = 5
+DEFAULT_MAX_Q = 2
+DIFFERENCING = 1
+
+# Information criteria an order can be selected by; lower is better
+CRITERIA = ("aic", "bic")
+DEFAULT_CRITERION = "aic"
+
+# How long a selected order is used before the grid search runs again
+DEFAULT_RESELECT_AFTER = timedelta(days=7)
+
+# Worker processes for order searches. They are separate from the model pool, so a search
+# never queues ahead of a refresh's fits, and run at a lower CPU priority
+DEFAULT_SELECTION_WORKERS = max(1, (os.cpu_count() or 1) // 4)
+SELECTION_NICENESS = 10
+
+_selection_pool_lock = threading.Lock()
+
+
+def candidate_orders(max_p=DEFAULT_MAX_P, max_q=DEFAULT_MAX_Q, d=DIFFERENCING):
+    """Every (p, d, q) in the bounded grid, except the random walk"""
+    return [(p, d, q) for p, q in itertools.product(range(max_p + 1), range(max_q + 1)) if p or q]
+
+
+def _lower_priority():
+    if hasattr(os, "nice"):
+        os.nice(SELECTION_NICENESS)
+
+
+def get_selection_pool(max_workers=DEFAULT_SELECTION_WORKERS):
+    """Get the process pool that runs order searches"""
+    with _selection_pool_lock:
+        if getattr(get_selection_pool, "instance", None) is None:
+            get_selection_pool.instance = ProcessPoolExecutor(max_workers=max_workers, initializer=_lower_priority)
+        return get_selection_pool.instance
+
+
+def shutdown_selection_pool(terminate=False):
+    """Stop the order search workers (a new pool is created on next use)"""
+    with _selection_pool_lock:
+        pool = getattr(get_selection_pool, "instance", None)
+        get_selection_pool.instance = None
+    if pool is not None:
+        stop_pool(pool, terminate)
+
+
+def score_order(close_prices, order, criterion=DEFAULT_CRITERION):
+    """
+    Fit one candidate order and return its information criterion (inf if the fit fails)
+    Kept free of I/O so it can run in a worker process
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            score = float(getattr(ARIMA(close_prices, order=order).fit(), criterion))
+        return score if np.isfinite(score) else float("inf")
+    except Exception:
+        return float("inf")
+
+
+def select_orders(series, criterion=DEFAULT_CRITERION, orders=None, timeout=None):
+    """
+    Grid-search the best order for several tickers at once.
+    Every (ticker, order) candidate is a separate task in the selection pool, so the
+    search is spread over its workers. Returns {ticker: (order, score)} for tickers
+    with at least one successful fit.
+    """
+    orders = orders or candidate_orders()
+    tasks = [((ticker, order), score_order, (np.asarray(close, dtype=float), order, criterion))
+             for ticker, close in series.items() for order in orders]
+    kwargs = {"timeout": timeout} if timeout else {}
+    best = {}
+    labels = {key: key[0] for key, _, _ in tasks}
+    for (ticker, order), score, error in run_model_fits(tasks, stage="arima_order_select", labels=labels,
+                                                        get_pool=get_selection_pool,
+                                                        discard_pool=shutdown_selection_pool, **kwargs):
+        if error is None and np.isfinite(score) and (ticker not in best or score < best[ticker][1]):
+            best[ticker] = (order, score)
+    return best
+
+
+class ArimaOrderCache:
+    """
+    Selected ARIMA order per ticker, persisted as JSON with the time it was chosen.
+    order() answers from the cache immediately; tickers never selected or
+    selected more than `reselect_after` ago are queued for a grid search that
+    runs in a background thread, and use their previous (or the fallback) order
+    until it finishes. With autoselect=False nothing is queued.
+    """
+
+    def __init__(self, path=None, reselect_after=DEFAULT_RESELECT_AFTER, criterion=DEFAULT_CRITERION,
+                 orders=None, clock=None, autoselect=True):
+        if criterion not in CRITERIA:
+            raise ValueError(f"Unknown criterion: {criterion} (use one of {', '.join(CRITERIA)})")
+        self.path = path or os.path.join(get_cache_dir(), "arima_orders.json")
+        self.reselect_after = reselect_after
+        self.criterion = criterion
+        self.orders = orders or candidate_orders()
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self.autoselect = autoselect
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.pending = {}
+        self.queue = queue.Queue()
+        self.worker = None
+        self.hits = 0
+        self.misses = 0
+        self.selections = 0
+        self.load()
+
+    def load(self):
+        """Load persisted entries, ignoring a missing or corrupt file"""
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        with self.lock:
+            snapshot = json.dumps(self.entries)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self.path)
+
+    def stale(self, ticker):
+        entry = self.entries.get(ticker)
+        if entry is None or entry["criterion"] != self.criterion or tuple(entry["order"]) not in self.orders:
+            return True
+        return self.clock() - datetime.fromisoformat(entry["selected_at"]) >= self.reselect_after
+
+    def get(self, ticker, default=FALLBACK_ORDER):
+        """The ticker's selected order, however old, without scheduling a search"""
+        entry = self.entries.get(ticker)
+        return tuple(entry["order"]) if entry else default
+
+    def order(self, ticker, close_prices=None):
+        """
+        The order to fit for a ticker now.
+        If it is due for re-selection and close_prices are given, a background search is queued.
+        """
+        with self.lock:
+            stale = self.stale(ticker)
+            if stale:
+                self.misses += 1
+            else:
+                self.hits += 1
+            if stale and self.autoselect and close_prices is not None and ticker not in self.pending:
+                self.pending[ticker] = np.asarray(close_prices, dtype=float)
+                self.queue.put(ticker)
+                if self.worker is None or not self.worker.is_alive():
+                    self.worker = threading.Thread(target=self._select_loop, daemon=True)
+                    self.worker.start()
+        return self.get(ticker)
+
+    def store(self, ticker, order, score):
+        with self.lock:
+            self.entries[ticker] = {
+                "order": list(order),
+                "criterion": self.criterion,
+                "score": score,
+                "selected_at": self.clock().isoformat(),
+            }
+            self.selections += 1
+
+    def select(self, series):
+        """Run the grid search for {ticker: close prices} now, store and persist the winners"""
+        for ticker, (order, score) in select_orders(series, self.criterion, self.orders).items():
+            self.store(ticker, order, score)
+        self.save()
+
+    def _select_loop(self):
+        while True:
+            # Take every ticker queued so far, so their candidates share one pass over the pool
+            tickers = [self.queue.get()]
+            while not self.queue.empty():
+                tickers.append(self.queue.get_nowait())
+            with self.lock:
+                series = {ticker: self.pending[ticker] for ticker in tickers}
+            try:
+                self.select(series)
+            except Exception:
+                pass
+            with self.lock:
+                for ticker in tickers:
+                    self.pending.pop(ticker, None)
+
+    def wait(self):
+        """Block until every queued search has finished"""
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return
+            time.sleep(0.1)
+
+
+def set_arima_order_cache(cache):
+    """Replace the process-wide ARIMA order cache"""
+    get_arima_order_cache.instance = cache
+    return cache
+
+
+def get_arima_order_cache():
+    """Get the process-wide ARIMA order cache (persisted in the cache directory)"""
+    if not hasattr(get_arima_order_cache, "instance"):
+        get_arima_order_cache.instance = ArimaOrderCache()
+    return get_arima_order_cache.instance
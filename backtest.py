@@ -0,0 +1,271 @@
+import argparse
+import json
+import sys
+import time
+import warnings
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ai_analytics import _next_day_features, standardized_ols
+from arima_orders import FALLBACK_ORDER, get_arima_order_cache, shutdown_selection_pool
+from history_store import HistoryStore, get_history_store
+from model_pool import run_model_fits, shutdown_model_pool
+
+# Years of daily history replayed per index
+DEFAULT_YEARS = 10
+
+# Bars in the live windows: 60 calendar days for the regression, 120 for ARIMA
+DEFAULT_REGRESSION_BARS = 41
+DEFAULT_ARIMA_BARS = 83
+
+# Trading days the ARIMA trend looks ahead, as in iter_ai_insights
+DEFAULT_HORIZON = 5
+
+# ARIMA forecasts are evaluated every `step` bars (non-overlapping horizons) and the
+# parameters re-estimated every `refit_every` bars, filtered forward in between like the live cache
+DEFAULT_STEP = DEFAULT_HORIZON
+DEFAULT_ARIMA_REFIT_EVERY = 60
+
+# Seconds one ticker's whole ARIMA walk-forward may take in a worker
+DEFAULT_ARIMA_TIMEOUT = 600.0
+
+
+def load_histories(tickers, years=DEFAULT_YEARS, store=None):
+    """Daily bars for each ticker from the history store, backfilling tickers whose stored history is too short"""
+    store = store or get_history_store()
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=365 * years)).timestamp()
+    histories = {}
+    for ticker in tickers:
+        stored = store.load(ticker)
+        if stored is None or len(stored) == 0 or stored[0, 0] > cutoff:
+            store.backfill([ticker], period=f"{years}y")
+        histories[ticker] = store.window(ticker, days=366 * years)
+    return histories
+
+
+def rolling_regression(hist, window_bars=DEFAULT_REGRESSION_BARS):
+    """
+    Walk-forward evaluation of the next-day regression.
+    For every day t the model is fitted on the window of rows before t, exactly the
+    rows whose target return is already known, and predicts the return of day t+1.
+    All windows are strided views of one feature array and are solved in a single
+    batched least-squares call, instead of one fit per day.
+    Returns (predicted return, actual return, in-sample R² of the window) arrays.
+    """
+    X, y = _next_day_features(hist)
+    rows = window_bars - 2
+    if len(X) <= rows:
+        return np.empty(0), np.empty(0), np.empty(0)
+
+    origins = np.arange(rows, len(X))
+    X_windows = sliding_window_view(X[:-1], rows, axis=0).transpose(0, 2, 1)
+    y_windows = sliding_window_view(y[:-1], rows)
+    mean, std, coef, intercept, confidence = standardized_ols(X_windows, y_windows)
+    predicted = ((X[origins] - mean[:, 0]) / std[:, 0] * coef).sum(axis=1) + intercept
+    return predicted, y[origins], confidence
+
+
+def _ar_trend(close, origins, phi, horizon):
+    """Forecast trend in percent at each origin for an ARIMA(p,1,0) with fixed AR coefficients, vectorized over origins"""
+    diffs = np.diff(close)
+    p = len(phi)
+    # Differences up to each origin, most recent last
+    lags = diffs[origins[:, None] - p + np.arange(p)[None, :]] if p else np.empty((len(origins), 0))
+    total = np.zeros(len(origins))
+    for _ in range(horizon):
+        step = lags @ phi[::-1] if p else np.zeros(len(origins))
+        total += step
+        lags = np.column_stack([lags[:, 1:], step]) if p else lags
+    return total / close[origins] * 100
+
+
+def walk_forward_arima(close, window_bars=DEFAULT_ARIMA_BARS, horizon=DEFAULT_HORIZON, step=DEFAULT_STEP,
+                       refit_every=DEFAULT_ARIMA_REFIT_EVERY, order=FALLBACK_ORDER):
+    """
+    Walk-forward evaluation of the ARIMA trend for one ticker.
+    Kept free of I/O so it can run in a worker process.
+    Returns (forecast trend in percent, actual change in percent over the horizon) arrays.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    close = np.asarray(close, dtype=float)
+    origins = np.arange(window_bars - 1, len(close) - horizon, step)
+    forecasts = np.full(len(origins), np.nan)
+    refits = max(1, refit_every // step)
+    p, d, q = order
+    for start in range(0, len(origins), refits):
+        chunk = origins[start:start + refits]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            try:
+                fitted = ARIMA(close[chunk[0] - window_bars + 1:chunk[0] + 1], order=order).fit()
+            except Exception:
+                continue
+            if d == 1 and q == 0:
+                # Pure AR on differences: the filtered forecast is a linear recursion on the last p differences
+                forecasts[start:start + len(chunk)] = _ar_trend(close, chunk, np.asarray(fitted.params[:p]), horizon)
+                continue
+            for offset, origin in enumerate(chunk):
+                window = close[origin - window_bars + 1:origin + 1]
+                forecast = ARIMA(window, order=order).filter(fitted.params).forecast(steps=horizon)
+                forecasts[start + offset] = (forecast[-1] - window[-1]) / window[-1] * 100
+    actual = (close[origins + horizon] - close[origins]) / close[origins] * 100
+    keep = ~np.isnan(forecasts)
+    return forecasts[keep], actual[keep]
+
+
+def _hit_rate(predicted, actual):
+    moved = actual != 0
+    return float(np.mean(np.sign(predicted[moved]) == np.sign(actual[moved]))) if moved.any() else None
+
+
+def regression_report(predicted, actual, confidence):
+    """Out-of-sample hit rate and error of next-day predictions, and whether high-confidence days do better"""
+    if len(predicted) == 0:
+        return {"evaluated": 0}
+    errors = (predicted - actual) * 100
+    confident = confidence >= np.median(confidence)
+    return {
+        "evaluated": len(predicted),
+        "hit_rate": _hit_rate(predicted, actual),
+        "mae_pct": float(np.mean(np.abs(errors))),
+        "rmse_pct": float(np.sqrt(np.mean(errors ** 2))),
+        "mean_confidence": float(np.mean(confidence)),
+        "hit_rate_high_confidence": _hit_rate(predicted[confident], actual[confident]),
+        "hit_rate_low_confidence": _hit_rate(predicted[~confident], actual[~confident]),
+    }
+
+
+def arima_report(forecast, actual):
+    """Out-of-sample direction hit rate and error of the ARIMA trend"""
+    if len(forecast) == 0:
+        return {"evaluated": 0}
+    errors = forecast - actual
+    return {
+        "evaluated": len(forecast),
+        "hit_rate": _hit_rate(forecast, actual),
+        "mae_pct": float(np.mean(np.abs(errors))),
+        "rmse_pct": float(np.sqrt(np.mean(errors ** 2))),
+    }
+
+
+def run_backtest(histories, models=("regression", "arima"), step=DEFAULT_STEP,
+                 refit_every=DEFAULT_ARIMA_REFIT_EVERY, timeout=DEFAULT_ARIMA_TIMEOUT):
+    """
+    Replay each ticker's history through the prediction models.
+    Regressions are solved in-process; ARIMA walk-forwards run one ticker per worker process,
+    each with the order last selected for it.
+    Returns {ticker: {model: report}}.
+    """
+    results = {ticker: {"bars": len(hist)} for ticker, hist in histories.items()}
+    if "regression" in models:
+        for ticker, hist in histories.items():
+            results[ticker]["regression"] = regression_report(*rolling_regression(hist))
+    if "arima" in models:
+        orders = get_arima_order_cache()
+        tasks = [(ticker, walk_forward_arima, (hist["Close"].to_numpy(dtype=float), DEFAULT_ARIMA_BARS,
+                                               DEFAULT_HORIZON, step, refit_every, orders.get(ticker)))
+                 for ticker, hist in histories.items() if len(hist) > DEFAULT_ARIMA_BARS + DEFAULT_HORIZON]
+        for ticker, result, error in run_model_fits(tasks, timeout=timeout, stage="backtest_arima",
+                                                    labels={ticker: ticker for ticker, _, _ in tasks}):
+            report = {"evaluated": 0, "error": error} if error else arima_report(*result)
+            results[ticker]["arima"] = dict(report, order=list(orders.get(ticker)))
+    return results
+
+
+def _percent(value):
+    return f"{value * 100:6.1f}%" if value is not None else "    N/A"
+
+
+def format_report(results):
+    """Format backtest results as a table, one row per ticker"""
+    width = max([len(ticker) for ticker in results] + [len("Ticker")])
+    header = (f"{'Ticker':<{width}}  {'bars':>5}  {'reg hit':>7}  {'reg MAE':>7}  {'R² avg':>7}  {'hi conf':>7}"
+              f"  {'lo conf':>7}  {'arima hit':>9}  {'arima MAE':>9}")
+    lines = [header, "-" * len(header)]
+    for ticker, result in results.items():
+        reg = result.get("regression", {})
+        arima = result.get("arima", {})
+        line = f"{ticker:<{width}}  {result['bars']:>5}"
+        if reg.get("evaluated"):
+            line += (f"  {_percent(reg['hit_rate'])}  {reg['mae_pct']:6.2f}%  {reg['mean_confidence']:7.3f}"
+                     f"  {_percent(reg['hit_rate_high_confidence'])}  {_percent(reg['hit_rate_low_confidence'])}")
+        else:
+            line += f"  {'N/A':>7}  {'N/A':>7}  {'N/A':>7}  {'N/A':>7}  {'N/A':>7}"
+        if arima.get("evaluated"):
+            line += f"  {_percent(arima['hit_rate']):>9}  {arima['mae_pct']:8.2f}%"
+        else:
+            line += f"  {'N/A':>9}  {'N/A':>9}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    from providers import PROVIDERS, set_provider
+    from stock_fetcher import indices
+    from watchlist import load_watchlist, use_watchlist
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the next-day regression and ARIMA trend")
+    parser.add_argument("--provider", choices=sorted(set(PROVIDERS) - {"replay"}), default="yfinance",
+                        help="Market data provider for history not yet stored (default: yfinance)")
+    parser.add_argument("--watchlist", metavar="PATH",
+                        help="Backtest the symbols in a CSV or YAML watchlist instead of the built-in indices")
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS,
+                        help=f"Years of daily history to replay (default: {DEFAULT_YEARS})")
+    parser.add_argument("--models", default="regression,arima",
+                        help="Comma-separated models to evaluate (default: regression,arima)")
+    parser.add_argument("--step", type=int, default=DEFAULT_STEP,
+                        help=f"Bars between ARIMA forecast origins (default: {DEFAULT_STEP})")
+    parser.add_argument("--refit-every", type=int, default=DEFAULT_ARIMA_REFIT_EVERY,
+                        help=f"Bars between ARIMA parameter re-estimates (default: {DEFAULT_ARIMA_REFIT_EVERY})")
+    parser.add_argument("--select-orders", action="store_true",
+                        help="Run the ARIMA order search for indices whose selected order is missing or due first")
+    parser.add_argument("--output", metavar="PATH",
+                        help="Also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    models = args.models.split(",")
+    unknown = [model for model in models if model not in ("regression", "arima")]
+    if unknown:
+        parser.error(f"Unknown model(s): {', '.join(unknown)}")
+
+    set_provider(PROVIDERS[args.provider]())
+    if args.watchlist:
+        use_watchlist(load_watchlist(args.watchlist))
+    store = HistoryStore(backfill_period=f"{args.years}y")
+
+    start = time.perf_counter()
+    tickers = [info["ticker"] for info in indices.values()]
+    histories = load_histories(tickers, args.years, store)
+    loaded = time.perf_counter()
+    try:
+        if args.select_orders and "arima" in models:
+            orders = get_arima_order_cache()
+            due = {ticker: hist["Close"].to_numpy(dtype=float)[-DEFAULT_ARIMA_BARS:]
+                   for ticker, hist in histories.items() if orders.stale(ticker)}
+            if due:
+                print(f"Selecting ARIMA orders for {len(due)} indices...", file=sys.stderr)
+                orders.select(due)
+        results = run_backtest(histories, models, step=args.step, refit_every=args.refit_every)
+    finally:
+        shutdown_model_pool()
+        shutdown_selection_pool()
+    finished = time.perf_counter()
+
+    print(format_report(results))
+    print(f"\nHistory loaded in {loaded - start:.2f}s, models evaluated in {finished - loaded:.2f}s", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": {"provider": args.provider, "years": args.years, "models": models,
+                           "step": args.step, "refit_every": args.refit_every},
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
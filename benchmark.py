@@ -0,0 +1,274 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from arima_cache import get_arima_cache
+from arima_orders import ArimaOrderCache, set_arima_order_cache
+from data_context import DataContext
+from history_store import HistoryStore, get_history_store, set_history_store
+from intraday import get_intraday_store
+from market_hours import DEFAULT_EXCHANGE, EXCHANGES
+from model_pool import shutdown_model_pool
+from news_cache import get_news_cache, get_sentiment_cache
+from providers import FakeProvider, ReplayProvider, replica_watchlist, set_provider
+from reference_cache import get_reference_cache
+from stock_fetcher import fetch_indices_data, indices
+from utils import display_indices_table
+from watchlist import use_watchlist
+
+# Timed runs per benchmark after the cold run
+DEFAULT_REPEAT = 5
+
+# Fixed clock of the synthetic market (a weekday during the NYSE session), so every run sees the same bars
+DEFAULT_NOW = "2025-01-07T15:00:00+00:00"
+
+# Size of the synthetic market
+DEFAULT_SYMBOLS = 20
+DEFAULT_HISTORY_DAYS = 500
+
+
+def synthetic_watchlist(count):
+    """A watchlist of `count` fake symbols spread over every known exchange"""
+    exchanges = sorted(EXCHANGES)
+    return {
+        f"SYM{n:04d}": {"name": f"Synthetic {n}", "ticker": f"SYM{n:04d}", "exchange": exchanges[n % len(exchanges)]}
+        for n in range(count)
+    }
+
+
+def recorded_watchlist(provider, copies=1):
+    """
+    A watchlist of every symbol in a recording, using the built-in index entry where there is one,
+    repeated `copies` times with replica symbols
+    """
+    known = {info["ticker"]: (key, info) for key, info in indices.items()}
+    watchlist = dict(known.get(symbol, (symbol, {"name": symbol, "ticker": symbol, "exchange": DEFAULT_EXCHANGE}))
+                     for symbol in provider.symbols())
+    return replica_watchlist(watchlist, copies)
+
+
+def reset_caches(root, history_days):
+    """Point every on-disk cache at a fresh directory and drop the in-memory ones, so the next run is cold"""
+    os.environ["STOCK_TRACKER_CACHE"] = tempfile.mkdtemp(dir=root)
+    for getter in (get_reference_cache, get_arima_cache, get_sentiment_cache, get_news_cache, get_history_store,
+                   get_intraday_store):
+        if hasattr(getter, "instance"):
+            del getter.instance
+    set_history_store(HistoryStore(backfill_period=f"{history_days}d"))
+    # Order searches run in the background and would compete with the timed runs
+    set_arima_order_cache(ArimaOrderCache(autoselect=False))
+
+
+def _tickers(quotes):
+    return [idx["ticker"] for idx in quotes]
+
+
+def bench_fetch_indices_data(state):
+    return fetch_indices_data(state["provider"], verbose=False)
+
+
+def bench_predict_next_day(state):
+    import ai_analytics
+    context = DataContext(state["provider"], now=state["now"])
+    return [ai_analytics.predict_next_day(ticker, context=context) for ticker in _tickers(state["quotes"])]
+
+
+def bench_get_arima_forecast(state):
+    import ai_analytics
+    context = DataContext(state["provider"], now=state["now"])
+    return [ai_analytics.get_arima_forecast(ticker, context=context) for ticker in _tickers(state["quotes"])]
+
+
+def bench_analyze_market_news(state):
+    import ai_analytics
+    context = DataContext(state["provider"], now=state["now"])
+    return [ai_analytics.analyze_market_news(ticker, context=context) for ticker in _tickers(state["quotes"])]
+
+
+def bench_get_ai_insights(state):
+    import ai_analytics
+    return ai_analytics.get_ai_insights(state["quotes"], context=DataContext(state["provider"], now=state["now"]))
+
+
+def bench_display_indices_table(state):
+    with contextlib.redirect_stdout(io.StringIO()):
+        display_indices_table(state["quotes"])
+
+
+def bench_generate_market_summary(state):
+    import ai_analytics
+    return ai_analytics.generate_market_summary(state["insights"])
+
+
+# Benchmarks in the order they run
+BENCHMARKS = {
+    "fetch_indices_data": bench_fetch_indices_data,
+    "predict_next_day": bench_predict_next_day,
+    "get_arima_forecast": bench_get_arima_forecast,
+    "analyze_market_news": bench_analyze_market_news,
+    "get_ai_insights": bench_get_ai_insights,
+    "display_indices_table": bench_display_indices_table,
+    "generate_market_summary": bench_generate_market_summary,
+}
+
+
+def _timed(fn, state):
+    start = time.perf_counter()
+    fn(state)
+    return time.perf_counter() - start
+
+
+def run_benchmark(name, state, repeat, root, history_days):
+    """
+    Time one benchmark: a cold run on empty caches, then `repeat` warm runs.
+    Peak memory is traced in a separate cold run so tracemalloc overhead stays out of the timings;
+    it covers this process only, not the model worker processes.
+    """
+    fn = BENCHMARKS[name]
+    reset_caches(root, history_days)
+    cold = _timed(fn, state)
+    warm = [_timed(fn, state) for _ in range(repeat)]
+
+    reset_caches(root, history_days)
+    tracemalloc.start()
+    try:
+        fn(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": len(warm),
+        "cold_seconds": cold,
+        "p50_seconds": float(np.percentile(warm, 50)),
+        "p95_seconds": float(np.percentile(warm, 95)),
+        "mean_seconds": float(np.mean(warm)),
+        "min_seconds": min(warm),
+        "max_seconds": max(warm),
+        "peak_memory_bytes": peak,
+    }
+
+
+def format_results(results, baseline=None):
+    """Format benchmark results as a table, with the p50 ratio against a baseline run if given"""
+    width = max(len(name) for name in results)
+    header = f"{'Benchmark':<{width}}  {'cold ms':>10}  {'p50 ms':>10}  {'p95 ms':>10}  {'peak MiB':>9}"
+    if baseline:
+        header += f"  {'vs base':>8}"
+    lines = [header, "-" * len(header)]
+    for name, result in results.items():
+        line = (f"{name:<{width}}  {result['cold_seconds'] * 1000:10.2f}  {result['p50_seconds'] * 1000:10.2f}"
+                f"  {result['p95_seconds'] * 1000:10.2f}  {result['peak_memory_bytes'] / 2**20:9.2f}")
+        base = (baseline or {}).get(name)
+        if base and base["p50_seconds"]:
+            line += f"  {result['p50_seconds'] / base['p50_seconds']:7.2f}x"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the stock tracker's refresh path")
+    parser.add_argument("--symbols", type=int, default=DEFAULT_SYMBOLS,
+                        help=f"Number of synthetic symbols (default: {DEFAULT_SYMBOLS})")
+    parser.add_argument("--history-days", type=int, default=DEFAULT_HISTORY_DAYS,
+                        help=f"Days of daily history per symbol (default: {DEFAULT_HISTORY_DAYS})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Warm runs per benchmark (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for the synthetic market (default: 0)")
+    parser.add_argument("--now",
+                        help=f"ISO timestamp treated as the current time (default: {DEFAULT_NOW}, or the recording's start with --replay)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Simulated seconds per provider call (default: 0)")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Serve the symbols and responses of a recording (main.py --record) instead of the synthetic market")
+    parser.add_argument("--replay-speed", type=float, default=0.0,
+                        help="With --replay: reproduce recorded latencies this many times faster, 0 for no delay (default: 0)")
+    parser.add_argument("--copies", type=int, default=1,
+                        help="With --replay: repeat every recorded symbol this many times to simulate a larger watchlist (default: 1)")
+    parser.add_argument("--only", metavar="NAME[,NAME...]",
+                        help=f"Run only these benchmarks ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--output", metavar="PATH", default="benchmark.json",
+                        help="Where to write the JSON results (default: benchmark.json)")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="Earlier results file to compare p50 timings against")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    root = tempfile.mkdtemp(prefix="stock_tracker_bench_")
+    try:
+        replay = ReplayProvider(args.replay, speed=args.replay_speed) if args.replay else None
+        if args.now:
+            now = datetime.fromisoformat(args.now)
+        else:
+            now = replay.now() if replay else datetime.fromisoformat(DEFAULT_NOW)
+        if now.tzinfo is None:
+            now = now.replace(tzinfo=timezone.utc)
+        if replay:
+            provider = set_provider(replay)
+            use_watchlist(recorded_watchlist(provider, args.copies))
+        else:
+            provider = set_provider(FakeProvider(seed=args.seed, latency=args.latency, history_days=args.history_days,
+                                                 now=now))
+            use_watchlist(synthetic_watchlist(args.symbols))
+
+        # Inputs for the display and summary benchmarks; caches are reset before every benchmark
+        reset_caches(root, args.history_days)
+        state = {"provider": provider, "now": now, "quotes": fetch_indices_data(provider, verbose=False)}
+        if "generate_market_summary" in names:
+            import ai_analytics
+            state["insights"] = ai_analytics.get_ai_insights(state["quotes"], context=DataContext(provider, now=now))
+
+        results = {}
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = run_benchmark(name, state, args.repeat, root, args.history_days)
+    finally:
+        shutdown_model_pool()
+        shutil.rmtree(root, ignore_errors=True)
+
+    document = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "symbols": len(indices),
+            "replay": args.replay,
+            "copies": args.copies,
+            "history_days": args.history_days,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "now": now.isoformat(),
+            "latency": args.latency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "benchmarks": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(document, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+    print(format_results(results, baseline))
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pandas as pd
+
+from history_store import COLUMNS, get_history_store
+from metrics import get_metrics
+from news_cache import get_news_cache
+from providers import get_provider
+
+# Longest history window any analytics stage asks for, in days
+MAX_WINDOW_DAYS = 120
+
+
+class DataContext:
+    """
+    Market data shared by every analytics stage during one refresh.
+    Each ticker's longest history window and its news are fetched once;
+    stages receive slices of that window instead of downloading their own.
+    """
+
+    def __init__(self, provider=None, store=None, news_cache=None, max_days=MAX_WINDOW_DAYS, now=None):
+        self.provider = provider or get_provider()
+        self.store = store or get_history_store()
+        self.news_cache = news_cache or get_news_cache()
+        self.max_days = max_days
+        self.now = now or self.provider.now()
+        self.lock = threading.Lock()
+        self._history = {}
+        self._news = {}
+
+    def _full_history(self, ticker):
+        with self.lock:
+            hist = self._history.get(ticker)
+        if hist is None:
+            with get_metrics().span("history", ticker):
+                hist = self.store.window(ticker, days=self.max_days, provider=self.provider, now=self.now)
+            with self.lock:
+                self._history[ticker] = hist
+        return hist
+
+    def history(self, ticker, days):
+        """Return the last `days` days of daily bars as a slice of the shared window"""
+        if days > self.max_days:
+            raise ValueError(f"Window of {days} days exceeds context maximum of {self.max_days}")
+        hist = self._full_history(ticker)
+        if hist.empty:
+            return hist
+        cutoff = self.now - timedelta(days=days)
+        return hist.iloc[hist.index.searchsorted(cutoff, side="right"):]
+
+    def news(self, ticker):
+        """Return the ticker's news items, fetched at most once per context and reused until the news TTL expires"""
+        with self.lock:
+            if ticker in self._news:
+                return self._news[ticker]
+        news = self.news_cache.get(ticker, self.provider)
+        with self.lock:
+            self._news[ticker] = news
+        return news
+
+    def prefetch(self, tickers, max_workers=8):
+        """Load history and news for all tickers concurrently"""
+        def load(ticker):
+            try:
+                self._full_history(ticker)
+            except Exception:
+                # That ticker gets no AI insights; the others are unaffected
+                with self.lock:
+                    self._history[ticker] = pd.DataFrame(columns=list(COLUMNS[1:]))
+            try:
+                self.news(ticker)
+            except Exception:
+                # A missing news feed only disables the sentiment stage
+                with self.lock:
+                    self._news[ticker] = []
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            list(executor.map(load, tickers))
+        return self
@@ -0,0 +1,147 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from providers import get_provider
+from utils import get_cache_dir
+
+# Column layout of the stored arrays; timestamps are epoch seconds
+COLUMNS = ("Timestamp", "Open", "High", "Low", "Close", "Volume")
+
+# History downloaded for a symbol the store has never seen
+DEFAULT_BACKFILL_PERIOD = "1y"
+
+# Seconds between incremental checks for new bars of the same symbol
+DEFAULT_MAX_AGE = 300
+
+
+def _to_array(hist):
+    """Convert a provider OHLCV DataFrame to the stored column-major layout"""
+    index = pd.DatetimeIndex(hist.index)
+    if index.tz is None:
+        index = index.tz_localize("UTC")
+    timestamps = ((index - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)).to_numpy(dtype=float)
+    columns = [timestamps] + [hist[name].to_numpy(dtype=float) for name in COLUMNS[1:]]
+    return np.asfortranarray(np.column_stack(columns))
+
+
+class HistoryStore:
+    """
+    On-disk store of daily OHLCV bars, one memory-mapped .npy file per ticker.
+    Arrays are column-major so each field is a contiguous slice. Updates only
+    request bars from the last stored timestamp onward, and windows are
+    served straight from disk without a network round trip.
+    """
+
+    def __init__(self, root=None, max_age=DEFAULT_MAX_AGE, backfill_period=DEFAULT_BACKFILL_PERIOD):
+        self.root = root or os.path.join(get_cache_dir(), "history")
+        self.max_age = max_age
+        self.backfill_period = backfill_period
+        self.lock = threading.Lock()
+        self.checked = {}
+
+    def _path(self, symbol, provider):
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", symbol)
+        return os.path.join(self.root, provider.name, f"{safe}.npy")
+
+    def load(self, symbol, provider=None):
+        """Return the stored array for a symbol (memory-mapped), or None"""
+        path = self._path(symbol, provider or get_provider())
+        try:
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, array):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npy"
+        np.save(tmp_path, np.asfortranarray(array))
+        os.replace(tmp_path, path)
+
+    def update(self, symbol, provider=None, force=False):
+        """
+        Append bars newer than the last stored one.
+        The last stored bar is requested again because an in-progress
+        session's daily bar keeps changing until the close.
+        Returns the number of bars received from the provider.
+        """
+        provider = provider or get_provider()
+        key = (provider.name, symbol)
+        with self.lock:
+            if not force and time.monotonic() - self.checked.get(key, float("-inf")) < self.max_age:
+                return 0
+            self.checked[key] = time.monotonic()
+
+        path = self._path(symbol, provider)
+        stored = self.load(symbol, provider)
+        if stored is None or len(stored) == 0:
+            hist = provider.history(symbol, period=self.backfill_period, interval="1d")
+        else:
+            start = datetime.fromtimestamp(stored[-1, 0], timezone.utc)
+            hist = provider.history(symbol, interval="1d", start=start)
+        if hist.empty:
+            return 0
+
+        fresh = _to_array(hist)
+        if stored is not None and len(stored):
+            keep = np.asarray(stored[stored[:, 0] < fresh[0, 0]])
+            fresh = np.concatenate([keep, fresh])
+        with self.lock:
+            self._write(path, fresh)
+        return len(hist)
+
+    def backfill(self, symbols, period=None, provider=None):
+        """Cold-start mode: download the full backfill period for every symbol"""
+        provider = provider or get_provider()
+        period = period or self.backfill_period
+        for symbol in symbols:
+            hist = provider.history(symbol, period=period, interval="1d")
+            if hist.empty:
+                continue
+            fresh = _to_array(hist)
+            stored = self.load(symbol, provider)
+            if stored is not None and len(stored):
+                newer = np.asarray(stored[stored[:, 0] > fresh[-1, 0]])
+                fresh = np.concatenate([fresh, newer])
+            with self.lock:
+                self._write(self._path(symbol, provider), fresh)
+                self.checked[(provider.name, symbol)] = time.monotonic()
+
+    def window(self, symbol, days=None, bars=None, provider=None, refresh=True, now=None):
+        """
+        Return the most recent bars for a symbol as an OHLCV DataFrame.
+        `days` mirrors yfinance's period="<n>d" counted back from `now` (the provider's clock by default);
+        `bars` limits the row count.
+        """
+        provider = provider or get_provider()
+        if refresh:
+            self.update(symbol, provider)
+        stored = self.load(symbol, provider)
+        if stored is None or len(stored) == 0:
+            return pd.DataFrame(columns=list(COLUMNS[1:]))
+
+        if days is not None:
+            cutoff = ((now or provider.now()) - timedelta(days=days)).timestamp()
+            stored = stored[np.searchsorted(stored[:, 0], cutoff, side="right"):]
+        if bars is not None:
+            stored = stored[-bars:]
+        index = pd.to_datetime((stored[:, 0] * 1e9).astype("int64"), utc=True)
+        return pd.DataFrame(stored[:, 1:], index=index, columns=list(COLUMNS[1:]))
+
+
+def set_history_store(store):
+    """Replace the process-wide history store"""
+    get_history_store.instance = store
+    return store
+
+
+def get_history_store():
+    """Get the process-wide history store"""
+    if not hasattr(get_history_store, "instance"):
+        get_history_store.instance = HistoryStore()
+    return get_history_store.instance
@@ -0,0 +1,210 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from market_hours import exchange_timezone
+from providers import get_provider
+
+# 1-minute bars kept per ticker; VWAP and the day's range are running totals, so they cover the whole session regardless
+DEFAULT_CAPACITY = 240
+
+# Characters of the intraday sparkline, lowest to highest
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+DEFAULT_SPARKLINE_WIDTH = 16
+
+
+def _session_days(timestamps, exchange):
+    """Local trading date (as days since the epoch) of each bar timestamp"""
+    index = pd.to_datetime(timestamps, unit="s", utc=True).tz_convert(exchange_timezone(exchange))
+    return ((index.tz_localize(None).normalize() - pd.Timestamp(0)) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+
+
+def _day_end(day, exchange):
+    """Epoch seconds of the local midnight that ends a trading date from _session_days"""
+    midnight = pd.Timestamp(day + 1, unit="D").tz_localize(exchange_timezone(exchange))
+    return int(midnight.timestamp())
+
+
+def sparkline(values, width=DEFAULT_SPARKLINE_WIDTH):
+    """Render a series as a row of block characters, resampled to `width` points"""
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return ""
+    if len(values) > width:
+        values = values[np.linspace(0, len(values) - 1, width).round().astype(int)]
+    low, high = values.min(), values.max()
+    if high == low:
+        return SPARK_CHARS[len(SPARK_CHARS) // 2] * len(values)
+    levels = ((values - low) / (high - low) * (len(SPARK_CHARS) - 1)).round().astype(int)
+    return "".join(SPARK_CHARS[level] for level in levels)
+
+
+class IntradayBuffer:
+    """
+    Fixed-size ring buffer of one ticker's 1-minute bars in preallocated arrays.
+    New bars overwrite the oldest ones; the bar at the newest timestamp may be
+    revised while it is still forming. VWAP, high and low are running totals for
+    the current session, so each update costs only the bars it adds.
+    A revision takes the old bar's volume back out of the VWAP, but cannot narrow the
+    day's range: a forming bar's high and low only ever widen, so its latest version
+    already covers the earlier one.
+    Fetch threads abandoned by a timed-out refresh can still be extending a buffer
+    when the next refresh starts, so updates and reads hold the buffer's lock.
+    """
+
+    def __init__(self, exchange=None, capacity=DEFAULT_CAPACITY):
+        self.exchange = exchange
+        self.capacity = capacity
+        self.lock = threading.RLock()
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.close = np.zeros(capacity)
+        self.volume = np.zeros(capacity)
+        self.pv = np.zeros(capacity)
+        self.high = np.zeros(capacity)
+        self.low = np.zeros(capacity)
+        self.end = 0
+        self.size = 0
+        self.session = None
+        self.session_start = None
+        self.session_end = None
+        self.session_pv = 0.0
+        self.session_volume = 0.0
+        self.session_high = -np.inf
+        self.session_low = np.inf
+
+    @property
+    def last_timestamp(self):
+        with self.lock:
+            return int(self.timestamps[(self.end - 1) % self.capacity]) if self.size else None
+
+    @property
+    def last_close(self):
+        with self.lock:
+            return float(self.close[(self.end - 1) % self.capacity]) if self.size else None
+
+    def _reset_session(self, session, start):
+        self.session = session
+        self.session_start = start
+        self.session_end = _day_end(session, self.exchange)
+        self.session_pv = 0.0
+        self.session_volume = 0.0
+        self.session_high = -np.inf
+        self.session_low = np.inf
+
+    def extend(self, hist):
+        """Add the bars of an OHLCV DataFrame that are newer than (or revise) the last stored bar"""
+        if hist is None or hist.empty:
+            return 0
+        index = pd.DatetimeIndex(hist.index)
+        if index.tz is None:
+            index = index.tz_localize("UTC")
+        timestamps = ((index - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+        with self.lock:
+            last = self.last_timestamp
+            keep = slice(None) if last is None else slice(int(np.searchsorted(timestamps, last)), None)
+            timestamps = timestamps[keep]
+            if len(timestamps) == 0:
+                return 0
+            close = hist["Close"].to_numpy(dtype=float)[keep]
+            high = hist["High"].to_numpy(dtype=float)[keep]
+            low = hist["Low"].to_numpy(dtype=float)[keep]
+            volume = np.nan_to_num(hist["Volume"].to_numpy(dtype=float)[keep])
+            pv = (high + low + close) / 3 * volume
+
+            if last is not None and timestamps[0] == last:
+                # The stored newest bar was still forming: take its contribution back out and overwrite it
+                revised = (self.end - 1) % self.capacity
+                if self.session_start is not None and last >= self.session_start:
+                    self.session_pv -= self.pv[revised]
+                    self.session_volume -= self.volume[revised]
+                self.end = revised
+                self.size -= 1
+
+            if self.session is not None and self.session_start <= timestamps[0] and timestamps[-1] < self.session_end:
+                # Common case: every new bar belongs to the current session
+                current = slice(None)
+            else:
+                sessions = _session_days(timestamps, self.exchange)
+                latest = sessions[-1]
+                if latest != self.session:
+                    self._reset_session(latest, int(timestamps[np.argmax(sessions == latest)]))
+                current = sessions == latest
+            self.session_pv += float(pv[current].sum())
+            self.session_volume += float(volume[current].sum())
+            self.session_high = max(self.session_high, float(high[current].max()))
+            self.session_low = min(self.session_low, float(low[current].min()))
+
+            count = min(len(timestamps), self.capacity)
+            slots = (self.end + np.arange(count)) % self.capacity
+            for target, values in ((self.timestamps, timestamps), (self.close, close), (self.volume, volume),
+                                   (self.pv, pv), (self.high, high), (self.low, low)):
+                target[slots] = values[-count:]
+            self.end = (self.end + count) % self.capacity
+            self.size = min(self.capacity, self.size + count)
+            return len(timestamps)
+
+    def _ordered(self, values):
+        start = (self.end - self.size) % self.capacity
+        return np.roll(values, -start)[:self.size]
+
+    def stats(self, width=DEFAULT_SPARKLINE_WIDTH):
+        """VWAP, high, low and a sparkline of closes for the current session"""
+        with self.lock:
+            if not self.size:
+                return {}
+            timestamps = self._ordered(self.timestamps)
+            closes = self._ordered(self.close)[timestamps >= (self.session_start or 0)]
+            return {
+                "vwap": round(float(self.session_pv / self.session_volume), 2) if self.session_volume else None,
+                "day_high": round(self.session_high, 2),
+                "day_low": round(self.session_low, 2),
+                "sparkline": sparkline(closes, width),
+            }
+
+
+class IntradayStore:
+    """
+    Intraday ring buffers for every ticker.
+    Each refresh only asks the provider for bars from the last stored one onward,
+    instead of the whole day of 1-minute bars.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.buffers = {}
+        self.bars_received = 0
+
+    def buffer(self, symbol, exchange=None):
+        with self.lock:
+            buffer = self.buffers.get(symbol)
+            if buffer is None:
+                buffer = self.buffers[symbol] = IntradayBuffer(exchange, self.capacity)
+            return buffer
+
+    def update_many(self, symbols, exchanges=None, provider=None):
+        """Fetch new bars for several tickers (at most two provider calls) and return {symbol: buffer}"""
+        provider = provider or get_provider()
+        exchanges = exchanges or {}
+        buffers = {symbol: self.buffer(symbol, exchanges.get(symbol)) for symbol in symbols}
+        cold = [symbol for symbol, buffer in buffers.items() if buffer.last_timestamp is None]
+        warm = [symbol for symbol, buffer in buffers.items() if buffer.last_timestamp is not None]
+        hists = {}
+        if cold:
+            hists.update(provider.history_many(cold, period="1d", interval="1m"))
+        if warm:
+            start = datetime.fromtimestamp(min(buffers[symbol].last_timestamp for symbol in warm), timezone.utc)
+            hists.update(provider.history_many(warm, interval="1m", start=start))
+        received = sum(buffers[symbol].extend(hist) for symbol, hist in hists.items() if symbol in buffers)
+        with self.lock:
+            self.bars_received += received
+        return buffers
+
+
+def get_intraday_store():
+    """Get the process-wide intraday bar store"""
+    if not hasattr(get_intraday_store, "instance"):
+        get_intraday_store.instance = IntradayStore()
+    return get_intraday_store.instance
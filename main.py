@@ -1,44 +1,183 @@
 import argparse
+import atexit
 import os
+import shutil
 import sys
+import tempfile
 import time
 import threading
-from apscheduler.schedulers.background import BackgroundScheduler
-from stock_fetcher import fetch_indices_data
-from notifier import check_notifications
-from utils import display_indices_table
-from ai_analytics import get_ai_insights, display_ai_insights, generate_market_summary
-from settings_menu import get_settings_instance
-import colorama
-from colorama import Fore, Style
+from datetime import timedelta
+from startup import phase, report, load_ai_analytics
+with phase("import market_scheduler"):
+    from market_scheduler import MarketScheduler
+    from market_hours import is_open
+with phase("import stock_fetcher"):
+    from stock_fetcher import indices, iter_indices_data, snapshot_indices_data, FetchReport
+    from stock_fetcher import DEFAULT_BATCH_SIZE, DEFAULT_MAX_WORKERS, DEFAULT_REFRESH_TIMEOUT
+    from watchlist import load_watchlist, use_watchlist
+    from providers import PROVIDERS, RateLimitedProvider, RecordingProvider, ReplayProvider, set_provider
+    from resilience import TokenBucket
+    from reference_cache import ReferenceCache, set_reference_cache
+    from history_store import HistoryStore, get_history_store, set_history_store
+with phase("import alert_engine, utils"):
+    from alert_engine import Alert, AlertEngine, FileSink, WebhookSink, get_alert_engine, load_rules, set_alert_engine
+    from utils import indices_header_rows, index_row_cells, select_view
+    from screen import DEFAULT_MAX_FPS, ScreenRenderer, get_renderer, set_renderer
+with phase("import settings_menu"):
+    from settings_menu import get_settings_instance
+    from model_pool import shutdown_model_pool
+    from arima_orders import CRITERIA, DEFAULT_CRITERION, DEFAULT_RESELECT_AFTER, ArimaOrderCache
+    from arima_orders import set_arima_order_cache, shutdown_selection_pool
+    from metrics import Metrics, get_metrics, set_metrics
+    from snapshot_stream import DEFAULT_BACKUPS, DEFAULT_ROTATE_BYTES, FORMATS, SnapshotWriter, snapshot_record
+    from snapshot_server import DEFAULT_ADDRESS, SnapshotServer, SnapshotState, subscribe
+    from snapshot import Snapshot
+    from collections import deque
+    import colorama
+    from colorama import Fore, Style
+
+# The analytics stack (ai_analytics) is imported lazily by load_ai_analytics()
+# the first time AI insights are enabled
 
 # Initialize colorama for colored terminal output
 colorama.init()
 
+# Most recent alerts shown below the quotes
+MAX_ALERT_LINES = 10
+
+def build_frame(settings, snapshot, alerts=(), ai=None, insights=None, status=None, summary=None):
+    """Assemble the rows of one screen frame from a ranked Snapshot"""
+    exchanges = sorted({info["exchange"] for info in indices.values()})
+    frame = [
+        f"{Style.BRIGHT}{Fore.GREEN}STOCK MARKET TRACKER{Style.RESET_ALL}",
+        f"Alert Threshold: {settings.threshold}% | Refresh: {settings.interval} min | AI: {'ON' if settings.ai_enabled else 'OFF'}"
+        f" | Markets open: {sum(map(is_open, exchanges))}/{len(exchanges)}",
+        "Press 'm' to open settings menu",
+        "",
+    ]
+    view = select_view(snapshot, settings.top_n, settings.view_filter)
+    frame.extend(indices_header_rows())
+    frame.extend(index_row_cells(idx) for idx in view.to_quotes())
+    if len(view) < len(snapshot):
+        frame.append(f"{Style.DIM}Showing {len(view)} of {len(snapshot)} quotes{Style.RESET_ALL}")
+    frame.extend(alerts)
+    if status:
+        frame.extend(["", status])
+    if insights is not None:
+        frame.extend(ai.ai_insights_header_rows())
+        frame.extend(ai.insight_row_cells(insight) for insight in insights)
+        frame.extend(ai.ai_insights_footer_rows())
+    if summary:
+        frame.extend(summary.splitlines())
+    return frame
+
 def job():
     # Get current settings
     settings = get_settings_instance()
+    renderer = get_renderer()
+    metrics = get_metrics()
+    metrics.start_cycle()
+    try:
+        frame = refresh(settings, renderer)
+    finally:
+        metrics.end_cycle(budget=settings.interval * 60)
+    if settings.profile:
+        # Redraw the final frame with the breakdown of the refresh that just finished
+        renderer.render(frame + [""] + metrics.cycle_report(), force=True)
+
+def fetch_snapshot(settings, fetch_report, on_quote=None):
+    """Fetch every quote into a ranked Snapshot, calling on_quote(quotes so far) as each one lands"""
+    data = []
+    for quote in iter_indices_data(max_workers=settings.workers, verbose=False, market_aware=True,
+                                   report=fetch_report, batch_size=settings.batch_size,
+                                   refresh_timeout=settings.refresh_timeout):
+        data.append(quote)
+        if on_quote:
+            on_quote(data)
+    return snapshot_indices_data(data)
+
+def evaluate_alerts(settings, snapshot):
+    """Run the snapshot through the alert engine and return the alerts that fired"""
+    engine = get_alert_engine()
+    engine.set_threshold(settings.threshold)
+    return engine.evaluate(snapshot)
+
+def refresh(settings, renderer):
+    """Run one refresh, drawing frames as data arrives, and return the final frame"""
+    # Fetch data, redrawing the table as quotes land (capped by the renderer's frame rate)
+    def on_quote(data):
+        if renderer.due():
+            renderer.render(build_frame(settings, snapshot_indices_data(data)))
+
+    fetch_report = FetchReport()
+    snapshot = fetch_snapshot(settings, fetch_report, on_quote)
+    view = select_view(snapshot, settings.top_n, settings.view_filter).to_quotes()
+    evaluate_alerts(settings, snapshot)
+    alerts = get_alert_engine().recent_messages()
+    if fetch_report:
+        alerts.append(f"{Fore.YELLOW}Skipped: {fetch_report.summary()}{Style.RESET_ALL}")
+    frame = build_frame(settings, snapshot, alerts)
+    renderer.render(frame, force=True)
     
-    # Clear the screen
-    os.system('cls' if os.name == 'nt' else 'clear')
-    
-    # Show header with current settings
-    print(f"{Style.BRIGHT}{Fore.GREEN}STOCK MARKET TRACKER{Style.RESET_ALL}")
-    print(f"Alert Threshold: {settings.threshold}% | Refresh: {settings.interval} min | AI: {'ON' if settings.ai_enabled else 'OFF'}")
-    print(f"Press 'm' to open settings menu\n")
-    
-    # Fetch and display data
-    data = fetch_indices_data()
-    display_indices_table(data)
-    check_notifications(data, settings.threshold)
-    
-    # If AI mode is enabled, show AI-powered insights
+    # If AI mode is enabled, fill in AI-powered insights for the visible rows as each index's models finish
     if settings.ai_enabled:
-        print(f"\n{Fore.CYAN}Generating AI insights (this may take a moment)...{Style.RESET_ALL}")
-        insights = get_ai_insights(data)
-        display_ai_insights(insights)
-        summary = generate_market_summary(insights)
-        print(summary)
+        status = f"{Fore.CYAN}Generating AI insights (this may take a moment)...{Style.RESET_ALL}"
+        ai = load_ai_analytics()
+        insights = [dict(idx, pending=True) for idx in view]
+        renderer.render(build_frame(settings, snapshot, alerts, ai, insights, status), force=True)
+        for position, insight in ai.iter_ai_insights(view):
+            insights[position] = insight
+            if renderer.due():
+                renderer.render(build_frame(settings, snapshot, alerts, ai, insights, status))
+        summary = ai.generate_market_summary(insights)
+        frame = build_frame(settings, snapshot, alerts, ai, insights, summary=summary)
+        renderer.render(frame, force=True)
+    return frame
+
+def headless_job(writer):
+    """One refresh without any rendering: fetch, alerts and insights are written to the snapshot stream"""
+    settings = get_settings_instance()
+    metrics = get_metrics()
+    metrics.start_cycle()
+    try:
+        fetch_report = FetchReport()
+        snapshot = fetch_snapshot(settings, fetch_report)
+        alerts = evaluate_alerts(settings, snapshot)
+        insights = None
+        if settings.ai_enabled:
+            view = select_view(snapshot, settings.top_n, settings.view_filter).to_quotes()
+            insights = load_ai_analytics().get_ai_insights(view)
+    finally:
+        metrics.end_cycle(budget=settings.interval * 60)
+    headless_job.seq = getattr(headless_job, "seq", 0) + 1
+    writer.write(snapshot_record(snapshot, headless_job.seq, alerts=alerts, insights=insights,
+                                 skipped=fetch_report.skipped))
+    if settings.profile:
+        print("\n".join(metrics.cycle_report()), file=sys.stderr)
+
+def view_server(address):
+    """Viewer mode: draw the snapshots published by a snapshot server instead of fetching anything"""
+    settings = get_settings_instance()
+    renderer = get_renderer()
+    state = SnapshotState()
+    recent = deque(maxlen=MAX_ALERT_LINES)
+    for message in subscribe(address):
+        state.apply(message)
+        quotes = state.to_quotes()
+        names = {idx["country"]: idx["index_name"] for idx in quotes}
+        for alert in message.get("alerts", ()):
+            recent.appendleft(Alert(alert["rule"], alert["key"], names.get(alert["key"], alert["key"]), alert["kind"],
+                                    alert["threshold"], alert["change"], message["ts"]).message())
+        snapshot = Snapshot.from_quotes(quotes, state.order)
+        ai = insights = None
+        if state.insights:
+            ai = load_ai_analytics()
+            view = select_view(snapshot, settings.top_n, settings.view_filter).to_quotes()
+            insights = [dict(idx, **state.insights.get(idx["country"], {})) for idx in view]
+        status = None
+        if not state.connected:
+            status = f"{Fore.YELLOW}Not connected to {address}, retrying...{Style.RESET_ALL}"
+        renderer.render(build_frame(settings, snapshot, list(recent), ai, insights, status), force=True)
 
 def check_for_key_press():
     """Check for 'm' key press to open the settings menu"""
@@ -62,26 +201,31 @@ def check_for_key_press():
                     update_scheduler()
                     settings.settings_changed.clear()
                     
-                # Run the job immediately with new settings
-                job()
+                # The menu overwrote the screen, so redraw everything with new settings
+                get_renderer().reset()
+                scheduler.run_now()
         time.sleep(0.1)
 
 def update_scheduler():
     """Update the scheduler with new settings"""
-    global scheduler
     settings = get_settings_instance()
-    
-    # Remove existing jobs
-    for job_obj in scheduler.get_jobs():
-        scheduler.remove_job(job_obj.id)
-    
-    # Add new job with updated interval
-    scheduler.add_job(fetch_and_display, 'interval', minutes=settings.interval, id='market_update')
+    scheduler.set_interval(settings.interval)
 
 def fetch_and_display():
     """Wrapper function for the job to avoid name conflicts"""
     job()
 
+def use_session_caches():
+    """
+    Point the on-disk caches that answer in place of the provider (reference data and
+    stored history) at a fresh directory for this run, so a recording captures every
+    response and a replay is served from its recording alone
+    """
+    directory = tempfile.mkdtemp(prefix="stock_tracker_session_")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    set_reference_cache(ReferenceCache(path=os.path.join(directory, "reference.json")))
+    set_history_store(HistoryStore(root=os.path.join(directory, "history")))
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Live Global Stock Market CLI Tracker")
     parser.add_argument("--threshold", type=float, default=5.0,
@@ -90,18 +234,154 @@ if __name__ == "__main__":
                         help="Enable AI-powered market insights and predictions")
     parser.add_argument("--interval", type=int, default=1,
                         help="Refresh interval in minutes (default: 1)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"Number of tickers fetched in parallel (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="yfinance",
+                        help="Market data provider; 'fake' runs offline on synthetic data, 'replay' serves a --record file (default: yfinance)")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Append every provider response to this recording file, for replaying later")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Recording file served by --provider replay")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="Replay recorded latencies this many times faster, 0 for no delay (default: 1)")
+    parser.add_argument("--watchlist", metavar="PATH",
+                        help="Track the symbols in a CSV or YAML watchlist instead of the built-in indices")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Tickers requested per multi-ticker download (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--rate-limit", type=float, default=0,
+                        help="Maximum provider calls per second, 0 for no limit (default: 0)")
+    parser.add_argument("--refresh-timeout", type=float, default=DEFAULT_REFRESH_TIMEOUT,
+                        help=f"Seconds a refresh may take before unfinished tickers are skipped (default: {DEFAULT_REFRESH_TIMEOUT:g})")
+    parser.add_argument("--top", type=int, default=0,
+                        help="Only show the N biggest movers, 0 to show everything (default: 0)")
+    parser.add_argument("--filter", metavar="TEXT",
+                        help="Only show rows whose country, name or ticker contains TEXT")
+    parser.add_argument("--alert-rules", metavar="PATH",
+                        help="Load extra per-symbol or per-group alert rules from a CSV or YAML file")
+    parser.add_argument("--alert-log", metavar="PATH",
+                        help="Append every alert as a JSON line to this file")
+    parser.add_argument("--alert-webhook", metavar="URL",
+                        help="POST every batch of alerts as JSON to this (local) URL")
+    parser.add_argument("--arima-criterion", choices=CRITERIA, default=DEFAULT_CRITERION,
+                        help=f"Information criterion for each index's ARIMA order search (default: {DEFAULT_CRITERION})")
+    parser.add_argument("--arima-reselect-days", type=float, default=DEFAULT_RESELECT_AFTER.days,
+                        help=f"Days a selected ARIMA order is kept before searching again (default: {DEFAULT_RESELECT_AFTER.days})")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Download a full year of daily history for every index into the local store before starting")
+    parser.add_argument("--max-fps", type=float, default=DEFAULT_MAX_FPS,
+                        help=f"Maximum screen redraws per second while data streams in (default: {DEFAULT_MAX_FPS})")
+    parser.add_argument("--profile", action="store_true",
+                        help="Show a per-stage timing breakdown, cache hit rates and error counts after every refresh")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="Write Prometheus metrics to this file after every refresh (for node_exporter's textfile collector)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without the interactive screen and stream one snapshot per refresh instead")
+    parser.add_argument("--output", metavar="PATH", default="-",
+                        help="Headless mode: write snapshots to this file instead of stdout (rotated by size)")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl",
+                        help="Headless mode: snapshot encoding (default: jsonl)")
+    parser.add_argument("--rotate-bytes", type=int, default=DEFAULT_ROTATE_BYTES,
+                        help=f"Headless mode: rotate the output file past this size, 0 to never rotate (default: {DEFAULT_ROTATE_BYTES})")
+    parser.add_argument("--backups", type=int, default=DEFAULT_BACKUPS,
+                        help=f"Headless mode: rotated output files to keep (default: {DEFAULT_BACKUPS})")
+    parser.add_argument("--serve", nargs="?", const=DEFAULT_ADDRESS, metavar="ADDRESS",
+                        help=f"Run headless and publish snapshots to viewers on a Unix socket path or host:port (default: {DEFAULT_ADDRESS})")
+    parser.add_argument("--connect", nargs="?", const=DEFAULT_ADDRESS, metavar="ADDRESS",
+                        help="Show the snapshots of a running --serve instance instead of fetching data")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Report how long each import and initialisation phase took")
     args = parser.parse_args()
 
+    if args.provider == "replay" and not args.replay:
+        parser.error("--provider replay needs --replay PATH")
+
+    with phase("init provider"):
+        if args.provider == "replay":
+            provider = ReplayProvider(args.replay, speed=args.replay_speed)
+        else:
+            provider = PROVIDERS[args.provider]()
+        if args.record:
+            provider = RecordingProvider(provider, args.record)
+        if args.rate_limit > 0:
+            provider = RateLimitedProvider(provider, TokenBucket(args.rate_limit))
+        set_provider(provider)
+        if args.record or args.replay:
+            use_session_caches()
+
+    if args.watchlist:
+        with phase("load watchlist"):
+            use_watchlist(load_watchlist(args.watchlist))
+    set_renderer(ScreenRenderer(max_fps=args.max_fps))
+    set_metrics(Metrics(textfile=args.metrics_file))
+    set_arima_order_cache(ArimaOrderCache(reselect_after=timedelta(days=args.arima_reselect_days),
+                                          criterion=args.arima_criterion))
+
+    with phase("init alerts"):
+        sinks = []
+        if args.alert_log:
+            sinks.append(FileSink(args.alert_log))
+        if args.alert_webhook:
+            sinks.append(WebhookSink(args.alert_webhook))
+        engine = set_alert_engine(AlertEngine(sinks, recent=MAX_ALERT_LINES))
+        engine.set_groups({key: [info["ticker"], info["exchange"]] for key, info in indices.items()})
+        if args.alert_rules:
+            engine.add_rules(load_rules(args.alert_rules))
+
+    if args.backfill:
+        print("Backfilling local history store...", file=sys.stderr)
+        get_history_store().backfill([info["ticker"] for info in indices.values()])
+
     # Initialize settings with command line arguments
     settings = get_settings_instance(
         initial_threshold=args.threshold,
         initial_interval=args.interval,
-        initial_ai=args.ai
+        initial_ai=args.ai,
+        initial_workers=args.workers,
+        initial_top_n=args.top,
+        initial_filter=args.filter,
+        initial_batch_size=args.batch_size,
+        initial_refresh_timeout=args.refresh_timeout,
+        initial_profile=args.profile
     )
+    if settings.ai_enabled:
+        # Import the analytics stack while the first quotes are being fetched
+        from startup import preload_ai_analytics
+        preload_ai_analytics()
 
-    # Use background scheduler instead of blocking
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(fetch_and_display, 'interval', minutes=settings.interval, id='market_update')
+    if args.connect:
+        try:
+            view_server(args.connect)
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    exchanges = [info["exchange"] for info in indices.values()]
+    if args.headless or args.serve:
+        # No screen and no key listener: every refresh becomes one record on the snapshot stream
+        if args.serve:
+            writer = SnapshotServer(args.serve).start()
+            destination = f"viewers on {args.serve}"
+        else:
+            writer = SnapshotWriter(args.output, args.format, args.rotate_bytes, args.backups)
+            destination = f"{args.format} snapshots to {'stdout' if args.output == '-' else args.output}"
+        scheduler = MarketScheduler(lambda: headless_job(writer), exchanges, settings.interval, clock=provider.now)
+        print(f"[LAUNCH] Streaming {destination} every {settings.interval} minute(s)", file=sys.stderr)
+        scheduler.start()
+        scheduler.run_now()
+        if args.startup_profile:
+            print(report(), file=sys.stderr)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            scheduler.shutdown()
+            shutdown_model_pool()
+            shutdown_selection_pool()
+            writer.close()
+            sys.exit(0)
+
+    # Refresh at the configured interval while markets are open; closed markets are served from snapshots
+    with phase("init scheduler"):
+        scheduler = MarketScheduler(fetch_and_display, exchanges, settings.interval, clock=provider.now)
 
     # Use colorama for colored output
     print(f"{Fore.GREEN}[LAUNCH] Starting Stock Market Tracker{Style.RESET_ALL}")
@@ -115,7 +395,10 @@ if __name__ == "__main__":
     scheduler.start()
     
     # Run the job immediately
-    job()
+    with phase("first refresh"):
+        scheduler.run_now()
+    if args.startup_profile:
+        print(report())
     
     # Start the key press listener in the main thread
     try:
@@ -123,4 +406,6 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\nExiting application...")
         scheduler.shutdown()
+        shutdown_model_pool()
+        shutdown_selection_pool()
         sys.exit(0)
\ No newline at end of file
@@ -0,0 +1,101 @@
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# Regular trading sessions in exchange local time.
+# Weekends are closed; exchange holidays are not modelled.
+EXCHANGES = {
+    "NYSE": {"tz": "America/New_York", "open": time(9, 30), "close": time(16, 0)},
+    "TSX": {"tz": "America/Toronto", "open": time(9, 30), "close": time(16, 0)},
+    "BMV": {"tz": "America/Mexico_City", "open": time(8, 30), "close": time(15, 0)},
+    "LSE": {"tz": "Europe/London", "open": time(8, 0), "close": time(16, 30)},
+    "XETRA": {"tz": "Europe/Berlin", "open": time(9, 0), "close": time(17, 30)},
+    "EURONEXT": {"tz": "Europe/Paris", "open": time(9, 0), "close": time(17, 30)},
+    "BME": {"tz": "Europe/Madrid", "open": time(9, 0), "close": time(17, 30)},
+    "MIL": {"tz": "Europe/Rome", "open": time(9, 0), "close": time(17, 30)},
+    "SIX": {"tz": "Europe/Zurich", "open": time(9, 0), "close": time(17, 30)},
+    "TSE": {"tz": "Asia/Tokyo", "open": time(9, 0), "close": time(15, 30)},
+    "SSE": {"tz": "Asia/Shanghai", "open": time(9, 30), "close": time(15, 0)},
+    "HKEX": {"tz": "Asia/Hong_Kong", "open": time(9, 30), "close": time(16, 0)},
+    "KRX": {"tz": "Asia/Seoul", "open": time(9, 0), "close": time(15, 30)},
+    "NSE": {"tz": "Asia/Kolkata", "open": time(9, 15), "close": time(15, 30)},
+    "ASX": {"tz": "Australia/Sydney", "open": time(10, 0), "close": time(16, 0)},
+    "SGX": {"tz": "Asia/Singapore", "open": time(9, 0), "close": time(17, 0)},
+    "B3": {"tz": "America/Sao_Paulo", "open": time(10, 0), "close": time(17, 0)},
+}
+
+# Used for symbols whose exchange is unknown
+DEFAULT_EXCHANGE = "NYSE"
+
+
+def _session(exchange):
+    return EXCHANGES.get(exchange) or EXCHANGES[DEFAULT_EXCHANGE]
+
+
+def exchange_timezone(exchange):
+    """IANA time zone name of an exchange"""
+    return _session(exchange)["tz"]
+
+
+def _local(exchange, now=None):
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(ZoneInfo(_session(exchange)["tz"]))
+
+
+def _at(local_day, t, tz):
+    return datetime.combine(local_day, t, tzinfo=tz)
+
+
+def is_open(exchange, now=None):
+    """Check whether the exchange is inside its regular session"""
+    local = _local(exchange, now)
+    session = _session(exchange)
+    if local.weekday() >= 5:
+        return False
+    return session["open"] <= local.time() < session["close"]
+
+
+def next_open(exchange, now=None):
+    """Return the start of the next session strictly after `now` (UTC)"""
+    local = _local(exchange, now)
+    session = _session(exchange)
+    day = local.date()
+    while True:
+        start = _at(day, session["open"], local.tzinfo)
+        if start > local and start.weekday() < 5:
+            return start.astimezone(timezone.utc)
+        day += timedelta(days=1)
+
+
+def next_close(exchange, now=None):
+    """Return the end of the current or next session after `now` (UTC)"""
+    local = _local(exchange, now)
+    session = _session(exchange)
+    day = local.date()
+    while True:
+        end = _at(day, session["close"], local.tzinfo)
+        if end > local and end.weekday() < 5:
+            return end.astimezone(timezone.utc)
+        day += timedelta(days=1)
+
+
+def last_close(exchange, now=None):
+    """Return the end of the most recent completed session (UTC)"""
+    local = _local(exchange, now)
+    session = _session(exchange)
+    day = local.date()
+    while True:
+        end = _at(day, session["close"], local.tzinfo)
+        if end <= local and end.weekday() < 5:
+            return end.astimezone(timezone.utc)
+        day -= timedelta(days=1)
+
+
+def needs_refresh(exchange, fetched_at, now=None):
+    """
+    Whether a quote fetched at `fetched_at` (UTC) should be fetched again.
+    Quotes from open markets always refresh; quotes from closed markets are
+    reused unless the market has closed since they were fetched.
+    """
+    if fetched_at is None or is_open(exchange, now):
+        return True
+    return fetched_at < last_close(exchange, now)
@@ -0,0 +1,84 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from market_hours import is_open, next_open
+
+JOB_ID = "market_update"
+
+
+def next_refresh_time(exchanges, interval_minutes, now=None):
+    """
+    When the next refresh should run.
+    While any exchange is open refreshes follow the configured interval;
+    when all are closed the next one is at the earliest upcoming open.
+    """
+    now = now or datetime.now(timezone.utc)
+    interval = timedelta(minutes=interval_minutes)
+    if not exchanges or any(is_open(exchange, now) for exchange in exchanges):
+        return now + interval
+    return max(now + interval, min(next_open(exchange, now) for exchange in exchanges))
+
+
+class MarketScheduler:
+    """
+    Runs the refresh job on an APScheduler background scheduler, rescheduling
+    it after every run according to which markets are open. Requests that
+    arrive while a refresh is in progress are coalesced into a single rerun
+    instead of stacking up. Market hours are checked on `clock` (e.g. a replayed
+    recording's provider.now), while the job itself runs on the wall clock.
+    """
+
+    def __init__(self, refresh, exchanges, interval_minutes, clock=None):
+        self.refresh = refresh
+        self.clock = clock
+        self.exchanges = sorted(set(exchanges))
+        self.interval_minutes = interval_minutes
+        self.scheduler = BackgroundScheduler()
+        self.running = threading.Lock()
+        self.rerun_requested = threading.Event()
+        self.runs = 0
+        self.coalesced = 0
+
+    def start(self):
+        self.scheduler.start()
+        self._schedule_next()
+
+    def shutdown(self):
+        self.scheduler.shutdown(wait=False)
+
+    def set_interval(self, interval_minutes):
+        """Change the refresh interval and reschedule the next run"""
+        self.interval_minutes = interval_minutes
+        self._schedule_next()
+
+    def run_now(self):
+        """
+        Run a refresh in the calling thread.
+        If one is already running, ask it to run once more when it finishes and return.
+        """
+        if not self.running.acquire(blocking=False):
+            self.coalesced += 1
+            self.rerun_requested.set()
+            return False
+        try:
+            while True:
+                self.rerun_requested.clear()
+                self.runs += 1
+                self.refresh()
+                if not self.rerun_requested.is_set():
+                    break
+        finally:
+            self.running.release()
+            self._schedule_next()
+        return True
+
+    def _schedule_next(self):
+        if not self.scheduler.running:
+            return
+        now = self.clock() if self.clock else datetime.now(timezone.utc)
+        delay = next_refresh_time(self.exchanges, self.interval_minutes, now) - now
+        run_date = datetime.now(timezone.utc) + delay
+        self.scheduler.add_job(self.run_now, "date", run_date=run_date, id=JOB_ID,
+                               replace_existing=True, misfire_grace_time=None, coalesce=True)
@@ -0,0 +1,196 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Prefix of every exported metric name
+PREFIX = "stock_tracker"
+
+# Slowest tickers listed per stage in the cycle profile
+SLOWEST_TICKERS = 3
+
+
+def cache_counters():
+    """Cumulative (hits, lookups) of every cache that has been created so far"""
+    from arima_cache import get_arima_cache
+    from arima_orders import get_arima_order_cache
+    from news_cache import get_news_cache, get_sentiment_cache
+    from reference_cache import get_reference_cache
+
+    counters = {}
+    for name, getter in (("reference", get_reference_cache), ("news", get_news_cache),
+                         ("sentiment", get_sentiment_cache), ("arima_orders", get_arima_order_cache)):
+        cache = getattr(getter, "instance", None)
+        if cache is not None:
+            counters[name] = (cache.hits, cache.hits + cache.misses)
+    arima = getattr(get_arima_cache, "instance", None)
+    if arima is not None:
+        # A state update reuses the cached parameters, so it counts as a hit
+        counters["arima"] = (arima.hits + arima.updates, arima.hits + arima.updates + arima.refits)
+    return counters
+
+
+def open_circuits():
+    """Tickers whose circuit breaker is currently open"""
+    from resilience import get_circuit_breaker
+
+    breaker = getattr(get_circuit_breaker, "instance", None)
+    return breaker.open_keys() if breaker is not None else []
+
+
+class Metrics:
+    """
+    Timing spans and counters for the refresh hot path.
+    Spans are aggregated per stage for export and also kept per cycle (one
+    refresh) so the last cycle can be broken down by stage and ticker.
+    """
+
+    def __init__(self, textfile=None):
+        self.textfile = textfile
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.cycles = 0
+        self.overruns = 0
+        self.last_cycle_seconds = 0.0
+        self.cycle = None
+        self.last_cycle = None
+
+    @contextmanager
+    def span(self, stage, ticker=None):
+        """Time the enclosed block as one span of `stage`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, ticker)
+
+    def record(self, stage, seconds, ticker=None):
+        """Record a span measured elsewhere (e.g. in a worker process)"""
+        with self.lock:
+            total = self.stages.setdefault(stage, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+            if self.cycle is not None:
+                self.cycle["spans"].append((stage, ticker, seconds))
+
+    def increment(self, name, amount=1, **labels):
+        """Add to a counter, e.g. increment("provider_errors", reason="timeout")"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def start_cycle(self):
+        with self.lock:
+            self.cycle = {"started": time.perf_counter(), "spans": [], "caches": cache_counters(),
+                          "counters": dict(self.counters)}
+
+    def end_cycle(self, budget=None):
+        """
+        Close the current cycle; a cycle longer than `budget` seconds counts as an overrun.
+        Rewrites the Prometheus text file when one is configured.
+        """
+        with self.lock:
+            cycle, self.cycle = self.cycle, None
+            if cycle is None:
+                return
+            cycle["seconds"] = time.perf_counter() - cycle["started"]
+            cycle["budget"] = budget
+            cycle["overrun"] = budget is not None and cycle["seconds"] > budget
+            cycle["caches"] = {name: (hits - cycle["caches"].get(name, (0, 0))[0],
+                                      lookups - cycle["caches"].get(name, (0, 0))[1])
+                               for name, (hits, lookups) in cache_counters().items()}
+            cycle["counters"] = {key: value - cycle["counters"].get(key, 0) for key, value in self.counters.items()
+                                 if value != cycle["counters"].get(key, 0)}
+            cycle["open_circuits"] = open_circuits()
+            self.cycles += 1
+            self.overruns += cycle["overrun"]
+            self.last_cycle_seconds = cycle["seconds"]
+            self.last_cycle = cycle
+        if self.textfile:
+            self.write_prometheus(self.textfile)
+
+    def cycle_report(self):
+        """Per-stage breakdown of the last cycle as display lines"""
+        cycle = self.last_cycle
+        if cycle is None:
+            return []
+        budget = f", budget {cycle['budget']:g} s" if cycle["budget"] is not None else ""
+        lines = [f"Cycle profile ({cycle['seconds']:.2f} s{budget}{', OVERRUN' if cycle['overrun'] else ''}):"]
+        stages = {}
+        for stage, ticker, seconds in cycle["spans"]:
+            stages.setdefault(stage, []).append((seconds, ticker))
+        width = max([len(stage) for stage in stages] + [5])
+        for stage, spans in stages.items():
+            total = sum(seconds for seconds, _ in spans)
+            slowest = sorted((span for span in spans if span[1]), key=lambda span: span[0], reverse=True)
+            slowest = ", ".join(f"{ticker} {seconds * 1000:.0f} ms" for seconds, ticker in slowest[:SLOWEST_TICKERS])
+            lines.append(f"  {stage:<{width}}  {len(spans):5d} spans  {total * 1000:9.1f} ms total"
+                         f"{'  slowest: ' + slowest if slowest else ''}")
+        caches = [f"{name} {hits / lookups:.0%} ({hits}/{lookups})"
+                  for name, (hits, lookups) in sorted(cycle["caches"].items()) if lookups]
+        if caches:
+            lines.append(f"  Cache hit rates: {', '.join(caches)}")
+        counters = [f"{name}{'{' + ','.join(f'{k}={v}' for k, v in labels) + '}' if labels else ''} {value}"
+                    for (name, labels), value in sorted(cycle["counters"].items())]
+        lines.append(f"  Counters: {', '.join(counters) if counters else 'none'} | Overruns so far: {self.overruns}")
+        if cycle["open_circuits"]:
+            lines.append(f"  Open circuits: {', '.join(cycle['open_circuits'])}")
+        return lines
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format"""
+        def labels(pairs):
+            return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}" if pairs else ""
+
+        with self.lock:
+            stages = {stage: tuple(total) for stage, total in self.stages.items()}
+            counters = dict(self.counters)
+            cycles, overruns, last_cycle_seconds = self.cycles, self.overruns, self.last_cycle_seconds
+
+        lines = [f"# HELP {PREFIX}_stage_seconds Time spent per refresh stage",
+                 f"# TYPE {PREFIX}_stage_seconds summary"]
+        for stage, (count, seconds) in sorted(stages.items()):
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {seconds:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        caches = cache_counters()
+        lines += [f"# HELP {PREFIX}_cache_hits_total Cache lookups answered from the cache",
+                  f"# TYPE {PREFIX}_cache_hits_total counter"]
+        lines += [f'{PREFIX}_cache_hits_total{{cache="{name}"}} {hits}' for name, (hits, _) in sorted(caches.items())]
+        lines += [f"# HELP {PREFIX}_cache_lookups_total Cache lookups",
+                  f"# TYPE {PREFIX}_cache_lookups_total counter"]
+        lines += [f'{PREFIX}_cache_lookups_total{{cache="{name}"}} {lookups}'
+                  for name, (_, lookups) in sorted(caches.items())]
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines += [f"{PREFIX}_{name}_total{labels(pairs)} {value}"
+                      for (counter, pairs), value in sorted(counters.items()) if counter == name]
+
+        lines += [f"# TYPE {PREFIX}_cycles_total counter", f"{PREFIX}_cycles_total {cycles}",
+                  f"# TYPE {PREFIX}_cycle_overruns_total counter", f"{PREFIX}_cycle_overruns_total {overruns}",
+                  f"# TYPE {PREFIX}_last_cycle_seconds gauge", f"{PREFIX}_last_cycle_seconds {last_cycle_seconds:.6f}",
+                  f"# HELP {PREFIX}_open_circuits Tickers skipped by an open circuit breaker",
+                  f"# TYPE {PREFIX}_open_circuits gauge", f"{PREFIX}_open_circuits {len(open_circuits())}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the metrics for a node_exporter textfile collector (atomically, so it never reads a partial file)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+def set_metrics(metrics):
+    """Replace the process-wide metrics registry"""
+    get_metrics.instance = metrics
+    return metrics
+
+
+def get_metrics():
+    """Get the process-wide metrics registry"""
+    if not hasattr(get_metrics, "instance"):
+        get_metrics.instance = Metrics()
+    return get_metrics.instance
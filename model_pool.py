@@ -0,0 +1,130 @@
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import get_metrics
+
+# Seconds a single model fit may run before it is stopped
+DEFAULT_FIT_TIMEOUT = 30.0
+
+# Where workers can't interrupt themselves (no SIGALRM), a fit seen running this many
+# times its timeout gets the pool's processes killed and replaced
+BACKSTOP_FACTOR = 2.0
+
+_pool_lock = threading.Lock()
+
+
+def get_model_pool(max_workers=None):
+    """Get the shared process pool for CPU-bound model fits, sized to the available cores"""
+    with _pool_lock:
+        if getattr(get_model_pool, "instance", None) is None:
+            get_model_pool.instance = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1)
+        return get_model_pool.instance
+
+
+def stop_pool(pool, terminate=False):
+    """Shut a pool down without waiting; with terminate=True its workers are killed, even mid-fit"""
+    if terminate:
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_model_pool(terminate=False):
+    """Stop the worker processes (a new pool is created on next use)"""
+    with _pool_lock:
+        pool = getattr(get_model_pool, "instance", None)
+        get_model_pool.instance = None
+    if pool is not None:
+        stop_pool(pool, terminate)
+
+
+class FitTimeout(BaseException):
+    """Raised inside a worker when its fit runs past the timeout; a BaseException so fits' own `except Exception` can't swallow it"""
+
+
+def _raise_fit_timeout(signum, frame):
+    raise FitTimeout()
+
+
+def _timed_call(fn, args, timeout=None):
+    """
+    Run fn(*args) in a worker and return its result with the time it took there
+    Where SIGALRM exists the call is interrupted after `timeout` seconds, which frees the worker
+    """
+    alarm = bool(timeout) and hasattr(signal, "setitimer")
+    if alarm:
+        signal.signal(signal.SIGALRM, _raise_fit_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return result, time.perf_counter() - start
+
+
+def run_model_fits(tasks, timeout=DEFAULT_FIT_TIMEOUT, stage="model_fit", labels=None,
+                   get_pool=get_model_pool, discard_pool=shutdown_model_pool):
+    """
+    Run (key, function, args) tasks in the process pool from get_pool().
+    Yields (key, result, error) as each task finishes. A fit is stopped inside its
+    worker once it has run for `timeout` seconds and reported with a timeout error,
+    so one slow fit can't hold up the rest or keep a worker busy into later refreshes.
+    Without SIGALRM, a fit seen running for BACKSTOP_FACTOR times the timeout gets the
+    pool killed with discard_pool(terminate=True); unfinished tasks go to a fresh pool.
+    Time spent inside each worker is recorded as a `stage` span, labelled with labels[key].
+    """
+    metrics = get_metrics()
+    labels = labels or {}
+    calls = {key: (fn, args) for key, fn, args in tasks}
+
+    def submit(keys):
+        pool = get_pool()
+        return {pool.submit(_timed_call, *calls[key], timeout): key for key in keys}
+
+    try:
+        pending = submit(calls)
+    except BrokenProcessPool:
+        discard_pool()
+        for key in calls:
+            yield key, None, "Model worker pool unavailable"
+        return
+
+    # running() is already true while a task waits in the executor's call queue,
+    # so this clock starts early; the backstop's margin absorbs that
+    started = {}
+    while pending:
+        done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = pending.pop(future)
+            try:
+                result, seconds = future.result()
+                metrics.record(stage, seconds, labels.get(key))
+                yield key, result, None
+            except FitTimeout:
+                yield key, None, f"Model fit timed out after {timeout:g}s"
+            except BrokenProcessPool:
+                discard_pool()
+                yield key, None, "Model worker pool crashed"
+            except Exception as e:
+                yield key, None, str(e)
+
+        now = time.monotonic()
+        stuck = [future for future in pending
+                 if future.running() and now - started.setdefault(future, now) > timeout * BACKSTOP_FACTOR]
+        if stuck:
+            for future in stuck:
+                yield pending.pop(future), None, f"Model fit timed out after {timeout:g}s"
+            discard_pool(terminate=True)
+            started.clear()
+            try:
+                pending = submit(list(pending.values()))
+            except BrokenProcessPool:
+                for key in pending.values():
+                    yield key, None, "Model worker pool unavailable"
+                return
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils import get_cache_dir
+
+# Headlines whose polarity is remembered before the oldest is evicted
+DEFAULT_MAX_HEADLINES = 4096
+
+# Seconds a ticker's news feed is reused before the provider is asked again
+DEFAULT_NEWS_TTL = 900
+
+
+def headline_key(headline):
+    """Content hash used to identify a headline"""
+    return hashlib.sha1(headline.strip().encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    """
+    Bounded LRU cache of headline polarity keyed by content hash,
+    optionally persisted to a JSON file between runs.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_HEADLINES, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self.entries = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            self.entries = OrderedDict()
+        self._evict()
+
+    def save(self):
+        """Persist the cache if it has a path and changed since the last save"""
+        if not self.path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = json.dumps(list(self.entries.items()))
+            self.dirty = False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self.path)
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def score_many(self, headlines, scorer):
+        """
+        Return the polarity of every headline, in order.
+        Only headlines not seen before are passed to `scorer`, in one batch.
+        """
+        keys = [headline_key(h) for h in headlines]
+        scores = {}
+        unseen = {}
+        with self.lock:
+            for key, headline in zip(keys, headlines):
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    scores[key] = self.entries[key]
+                    self.hits += 1
+                elif key not in unseen:
+                    unseen[key] = headline
+                    self.misses += 1
+
+        if unseen:
+            fresh = dict(zip(unseen, scorer(list(unseen.values()))))
+            scores.update(fresh)
+            with self.lock:
+                self.entries.update(fresh)
+                self._evict()
+                self.dirty = True
+        return [scores[key] for key in keys]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self.entries),
+        }
+
+
+class NewsCache:
+    """Per-ticker news feeds reused for `ttl` seconds"""
+
+    def __init__(self, ttl=DEFAULT_NEWS_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ticker, provider):
+        key = (provider.name, ticker)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and self.clock() - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        news = provider.news(ticker)
+        with self.lock:
+            self.entries[key] = (self.clock(), news)
+        return news
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self.entries),
+        }
+
+
+def get_sentiment_cache():
+    """Get the process-wide headline sentiment cache (persisted in the cache directory)"""
+    if not hasattr(get_sentiment_cache, "instance"):
+        get_sentiment_cache.instance = SentimentCache(path=os.path.join(get_cache_dir(), "sentiment.json"))
+    return get_sentiment_cache.instance
+
+
+def get_news_cache():
+    """Get the process-wide news feed cache"""
+    if not hasattr(get_news_cache, "instance"):
+        get_news_cache.instance = NewsCache()
+    return get_news_cache.instance
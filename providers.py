@@ -0,0 +1,477 @@
+import importlib
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from recording import RecordWriter, read_records
+
+# Separator of replica symbols ("^GSPC#3") that a replay serves from the recorded base symbol
+REPLICA_SEPARATOR = "#"
+
+_OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def _request_start(start):
+    """A history request's start as the ISO string recordings are keyed by"""
+    return pd.Timestamp(start).isoformat() if start is not None else None
+
+
+def _error_type(error):
+    return f"{type(error).__module__}.{type(error).__qualname__}"
+
+
+def _recorded_error(header):
+    """Rebuild the exception of an error record, as a ConnectionError if its class can't be found"""
+    module, _, name = header.get("error_type", "").rpartition(".")
+    try:
+        cls = getattr(importlib.import_module(module), name)
+        if isinstance(cls, type) and issubclass(cls, Exception):
+            return cls(header["error"])
+    except Exception:
+        pass
+    return ConnectionError(f"Recorded provider error: {header['error']}")
+
+
+class DataProvider:
+    """
+    Interface between the tracker and a market data source.
+    Every fetch in the application goes through one of these methods.
+    """
+
+    name = "base"
+
+    def history(self, symbol, period="1d", interval="1m", start=None):
+        """Return an OHLCV DataFrame indexed by bar timestamp"""
+        raise NotImplementedError
+
+    def history_many(self, symbols, period="1d", interval="1m", start=None):
+        """Return {symbol: OHLCV DataFrame} for several symbols; providers with a batch endpoint override this"""
+        return {symbol: self.history(symbol, period=period, interval=interval, start=start) for symbol in symbols}
+
+    def info(self, symbol):
+        """Return the metadata dict for a symbol (previousClose etc.)"""
+        raise NotImplementedError
+
+    def news(self, symbol):
+        """Return a list of news items, each with 'title' and 'providerPublishTime'"""
+        raise NotImplementedError
+
+    def now(self):
+        """Current time in the market the data comes from (UTC)"""
+        return datetime.now(timezone.utc)
+
+
+class YFinanceProvider(DataProvider):
+    """Live data from Yahoo Finance"""
+
+    name = "yfinance"
+
+    def history(self, symbol, period="1d", interval="1m", start=None):
+        import yfinance as yf
+        ticker = yf.Ticker(symbol)
+        if start is not None:
+            return ticker.history(start=start, interval=interval)
+        return ticker.history(period=period, interval=interval)
+
+    def history_many(self, symbols, period="1d", interval="1m", start=None):
+        if len(symbols) == 1:
+            return {symbols[0]: self.history(symbols[0], period=period, interval=interval, start=start)}
+        import yfinance as yf
+        span = {"start": start} if start is not None else {"period": period}
+        frame = yf.download(symbols, interval=interval, group_by="ticker",
+                            progress=False, threads=True, auto_adjust=False, **span)
+        return {symbol: frame[symbol].dropna(how="all") for symbol in symbols
+                if symbol in frame.columns.get_level_values(0)}
+
+    def info(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+    def news(self, symbol):
+        import yfinance as yf
+        return yf.Ticker(symbol).news
+
+
+def parse_period(period):
+    """Convert a yfinance style period ('60d', '6mo', '10y', 'max') to a timedelta"""
+    if period in (None, "max"):
+        return None
+    units = {"d": 1, "wk": 7, "mo": 31, "y": 366}
+    for suffix, days in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return timedelta(days=int(period[:-len(suffix)]) * days)
+    raise ValueError(f"Unsupported period: {period}")
+
+
+_HEADLINES = [
+    "{name} rallies as investors cheer strong earnings",
+    "{name} slips amid growing recession fears",
+    "Analysts see steady outlook for {name}",
+    "{name} hits record high on upbeat economic data",
+    "Weak demand weighs on {name}",
+    "{name} flat ahead of central bank decision",
+    "Traders turn cautious on {name} after volatile week",
+    "{name} gains as inflation cools",
+]
+
+
+class FakeProvider(DataProvider):
+    """
+    Deterministic synthetic market for offline tests and benchmarks.
+    Each symbol gets its own seeded random walk, so the same bar always
+    has the same values no matter how it is requested. `latency` adds a
+    sleep to every call to imitate network round trips, and `failure_rate`
+    makes that fraction of calls raise ConnectionError.
+    """
+
+    name = "fake"
+
+    def __init__(self, seed=0, latency=0.0, history_days=3650, now=None, failure_rate=0.0):
+        self.seed = seed
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._failures = np.random.default_rng(seed)
+        self.history_days = history_days
+        self._now = now
+        self._daily = {}
+        self._intraday = {}
+        self.calls = 0
+
+    def now(self):
+        return self._now or datetime.now(timezone.utc)
+
+    def _rng(self, *parts):
+        key = "|".join(str(p) for p in (self.seed,) + parts)
+        return np.random.default_rng(zlib.crc32(key.encode()))
+
+    def _wait(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and self._failures.random() < self.failure_rate:
+            raise ConnectionError("Simulated provider failure")
+
+    def _daily_frame(self, symbol):
+        today = pd.Timestamp(self.now().date())
+        cached = self._daily.get(symbol)
+        if cached is not None and cached[0] == today:
+            return cached[1]
+        end = today - pd.offsets.BDay(1)
+        dates = pd.bdate_range(end=end, periods=self.history_days, tz="UTC")
+        rng = self._rng(symbol, "daily")
+        base = 1000 + (zlib.crc32(symbol.encode()) % 20000)
+        returns = rng.normal(0.0003, 0.01, len(dates))
+        close = base * np.exp(np.cumsum(returns))
+        open_ = close * (1 + rng.normal(0, 0.003, len(dates)))
+        spread = np.abs(rng.normal(0, 0.006, len(dates)))
+        frame = pd.DataFrame({
+            "Open": open_,
+            "High": np.maximum(open_, close) * (1 + spread),
+            "Low": np.minimum(open_, close) * (1 - spread),
+            "Close": close,
+            "Volume": rng.integers(1_000_000, 5_000_000, len(dates)).astype(float),
+        }, index=dates)
+        self._daily[symbol] = (today, frame)
+        return frame
+
+    def _intraday_frame(self, symbol):
+        today = pd.Timestamp(self.now().date(), tz="UTC")
+        cached = self._intraday.get(symbol)
+        if cached is not None and cached[0] == today:
+            return cached[1]
+        prev_close = self._daily_frame(symbol)["Close"].iloc[-1]
+        minutes = pd.date_range(start=today, periods=24 * 60, freq="min")
+        rng = self._rng(symbol, today.date())
+        close = prev_close * np.exp(np.cumsum(rng.normal(0, 0.0006, len(minutes))))
+        open_ = np.concatenate(([prev_close], close[:-1]))
+        frame = pd.DataFrame({
+            "Open": open_,
+            "High": np.maximum(open_, close),
+            "Low": np.minimum(open_, close),
+            "Close": close,
+            "Volume": rng.integers(1_000, 50_000, len(minutes)).astype(float),
+        }, index=minutes)
+        self._intraday[symbol] = (today, frame)
+        return frame
+
+    def history(self, symbol, period="1d", interval="1m", start=None):
+        self._wait()
+        return self._history(symbol, period, interval, start)
+
+    def history_many(self, symbols, period="1d", interval="1m", start=None):
+        # One simulated round trip for the whole batch
+        self._wait()
+        return {symbol: self._history(symbol, period, interval, start) for symbol in symbols}
+
+    def _history(self, symbol, period="1d", interval="1m", start=None):
+        if interval == "1m":
+            frame = self._intraday_frame(symbol)
+            frame = frame[frame.index <= pd.Timestamp(self.now())]
+        elif interval == "1d":
+            frame = self._daily_frame(symbol)
+        else:
+            raise ValueError(f"Unsupported interval: {interval}")
+
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(start)].copy()
+        span = parse_period(period)
+        if span is not None:
+            frame = frame[frame.index > pd.Timestamp(self.now()) - span]
+        return frame.copy()
+
+    def info(self, symbol):
+        self._wait()
+        daily = self._daily_frame(symbol)
+        return {
+            "symbol": symbol,
+            "shortName": symbol,
+            "previousClose": float(daily["Close"].iloc[-1]),
+            "currency": "USD",
+        }
+
+    def news(self, symbol):
+        self._wait()
+        rng = self._rng(symbol, "news", self.now().date())
+        published = int(self.now().timestamp())
+        picks = rng.choice(len(_HEADLINES), size=5, replace=False)
+        return [{
+            "title": _HEADLINES[i].format(name=symbol),
+            "providerPublishTime": published - 3600 * n,
+        } for n, i in enumerate(picks)]
+
+
+class RateLimitedProvider(DataProvider):
+    """Wraps another provider so every call first takes a token from a rate limiter"""
+
+    def __init__(self, provider, limiter):
+        self.provider = provider
+        self.limiter = limiter
+        self.name = provider.name
+
+    def history(self, symbol, period="1d", interval="1m", start=None):
+        self.limiter.acquire()
+        return self.provider.history(symbol, period=period, interval=interval, start=start)
+
+    def history_many(self, symbols, period="1d", interval="1m", start=None):
+        self.limiter.acquire()
+        return self.provider.history_many(symbols, period=period, interval=interval, start=start)
+
+    def info(self, symbol):
+        self.limiter.acquire()
+        return self.provider.info(symbol)
+
+    def news(self, symbol):
+        self.limiter.acquire()
+        return self.provider.news(symbol)
+
+    def now(self):
+        return self.provider.now()
+
+
+class RecordingProvider(DataProvider):
+    """
+    Wraps another provider and appends every response (history bars, info and news,
+    or the error raised) to a recording file, with when it was made and how long it took.
+    `at` is the provider's clock when the request was made, so a replay can run on it.
+    """
+
+    def __init__(self, provider, path, clock=time.monotonic):
+        self.provider = provider
+        self.name = provider.name
+        self.writer = RecordWriter(path)
+        self.clock = clock
+        self.started = clock()
+
+    def _record(self, call, symbols, fetch, **request):
+        """Run fetch() and record its result ({symbol: frame} for history calls) or the error it raised"""
+        started = self.clock()
+        header = dict(request, call=call, t=round(started - self.started, 6), at=self.provider.now().isoformat())
+        try:
+            result = fetch()
+        except Exception as e:
+            latency = round(self.clock() - started, 6)
+            for symbol in symbols:
+                self.writer.write(dict(header, symbol=symbol, latency=latency, error=str(e), error_type=_error_type(e)))
+            raise
+        header["latency"] = round(self.clock() - started, 6)
+        if call == "history":
+            for symbol in symbols:
+                frame = result.get(symbol)
+                self.writer.write(dict(header, symbol=symbol, batch=len(symbols)),
+                                  frame if frame is not None else pd.DataFrame(columns=_OHLCV))
+        else:
+            self.writer.write(dict(header, symbol=symbols[0], response=result))
+        return result
+
+    def history(self, symbol, period="1d", interval="1m", start=None):
+        fetch = lambda: {symbol: self.provider.history(symbol, period=period, interval=interval, start=start)}
+        return self._record("history", [symbol], fetch, period=period, interval=interval,
+                            start=_request_start(start))[symbol]
+
+    def history_many(self, symbols, period="1d", interval="1m", start=None):
+        fetch = lambda: self.provider.history_many(symbols, period=period, interval=interval, start=start)
+        return self._record("history", list(symbols), fetch, period=period, interval=interval,
+                            start=_request_start(start))
+
+    def info(self, symbol):
+        return self._record("info", [symbol], lambda: self.provider.info(symbol))
+
+    def news(self, symbol):
+        return self._record("news", [symbol], lambda: self.provider.news(symbol))
+
+    def now(self):
+        return self.provider.now()
+
+    def close(self):
+        self.writer.close()
+
+
+class ReplayProvider(DataProvider):
+    """
+    Serves the responses of a recording file instead of calling a data source.
+    A request gets the responses recorded for the same call, symbol, interval and
+    period or start, in order, and the last one again once they run out. A history
+    request that was never recorded as such is cut from the widest recorded window
+    of the symbol. Recorded errors are raised again with their original class.
+    now() follows the recording's clock: the time the latest served response was
+    recorded, starting at the first record.
+    Recorded latencies are reproduced divided by `speed`: 1.0 is real speed,
+    10 is ten times faster, 0 is as fast as possible.
+    Replica symbols such as "^GSPC#3" are served from "^GSPC", so one recording can
+    drive a watchlist many times its size (see replica_watchlist).
+    """
+
+    name = "replay"
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.responses = {}
+        self.windows = {}
+        self.positions = {}
+        self.calls = 0
+        self.recorded_at = None
+        for header, frame in read_records(path):
+            if self.recorded_at is None and header.get("at"):
+                self.recorded_at = datetime.fromisoformat(header["at"])
+            start = _request_start(header.get("start"))
+            key = (header["call"], header["symbol"], header.get("interval"),
+                   header.get("period") if start is None else None, start)
+            self.responses.setdefault(key, []).append((header, frame))
+            if frame is not None and not frame.empty:
+                self.windows.setdefault((header["symbol"], header.get("interval")), []).append((header, frame))
+
+    def symbols(self):
+        """Every symbol with recorded responses, in first-recorded order"""
+        return list(dict.fromkeys(key[1] for key in self.responses))
+
+    def _next(self, call, symbol, interval=None, period=None, start=None):
+        base = symbol.split(REPLICA_SEPARATOR)[0]
+        start = _request_start(start)
+        key = (call, base, interval, period if start is None else None, start)
+        with self.lock:
+            self.calls += 1
+            responses = self.responses.get(key)
+            if not responses:
+                return self._widest(call, base, interval)
+            position = self.positions.get((key, symbol), 0)
+            self.positions[(key, symbol)] = position + 1
+            response = responses[min(position, len(responses) - 1)]
+            self._advance(response[0])
+        return response
+
+    def _advance(self, header):
+        if header.get("at"):
+            at = datetime.fromisoformat(header["at"])
+            if self.recorded_at is None or at > self.recorded_at:
+                self.recorded_at = at
+
+    def now(self):
+        with self.lock:
+            recorded_at = self.recorded_at
+        # Recordings made before `at` was recorded run on the wall clock
+        return recorded_at or datetime.now(timezone.utc)
+
+    def _widest(self, call, base, interval):
+        """The recorded window reaching furthest back, the latest of those that reach as far"""
+        windows = self.windows.get((base, interval)) if call == "history" else None
+        if not windows:
+            raise LookupError(f"No recorded {call} response for {base}")
+        return min(reversed(windows), key=lambda response: response[1].index[0])
+
+    def _wait(self, latency):
+        if self.speed and latency:
+            time.sleep(latency / self.speed)
+
+    def _frame(self, header, frame, period, start):
+        if "error" in header:
+            raise _recorded_error(header)
+        frame = frame.copy()
+        if frame.empty:
+            return frame
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(start)]
+        span = parse_period(period)
+        if span is not None:
+            frame = frame[frame.index > frame.index[-1] - span]
+        return frame
+
+    def history(self, symbol, period="1d", interval="1m", start=None):
+        header, frame = self._next("history", symbol, interval, period, start)
+        self._wait(header["latency"])
+        return self._frame(header, frame, period, start)
+
+    def history_many(self, symbols, period="1d", interval="1m", start=None):
+        # A batch costs one round trip, as long as the slowest recorded response it is made of
+        responses = {symbol: self._next("history", symbol, interval, period, start) for symbol in symbols}
+        self._wait(max((header["latency"] for header, _ in responses.values()), default=0))
+        return {symbol: self._frame(header, frame, period, start) for symbol, (header, frame) in responses.items()}
+
+    def _response(self, call, symbol):
+        header, _ = self._next(call, symbol)
+        self._wait(header["latency"])
+        if "error" in header:
+            raise _recorded_error(header)
+        return header["response"]
+
+    def info(self, symbol):
+        return self._response("info", symbol)
+
+    def news(self, symbol):
+        return self._response("news", symbol)
+
+
+def replica_watchlist(watchlist, copies):
+    """Repeat every watchlist entry `copies` times with replica symbols a ReplayProvider serves from the original"""
+    if copies <= 1:
+        return dict(watchlist)
+    return {
+        f"{key}{REPLICA_SEPARATOR}{n}" if n else key: dict(entry, ticker=f"{entry['ticker']}{REPLICA_SEPARATOR}{n}" if n else entry["ticker"])
+        for n in range(copies) for key, entry in watchlist.items()
+    }
+
+
+# Providers selectable by name; "replay" also needs the path of a recording
+PROVIDERS = {
+    "yfinance": YFinanceProvider,
+    "fake": FakeProvider,
+    "replay": ReplayProvider,
+}
+
+
+def set_provider(provider):
+    """Replace the process-wide data provider"""
+    get_provider.instance = provider
+    return provider
+
+
+def get_provider():
+    """Get the process-wide data provider (Yahoo Finance by default)"""
+    if not hasattr(get_provider, "instance"):
+        get_provider.instance = YFinanceProvider()
+    return get_provider.instance
@@ -0,0 +1,89 @@
+import json
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# File magic written once at the start of a recording
+RECORDING_MAGIC = b"STRC1\n"
+
+# Record: u32 header length, u32 body length, JSON header (UTF-8), body.
+# History bodies are zlib-compressed int64 bar timestamps (ns) followed by the float64 values row by row
+_RECORD = struct.Struct("<II")
+
+
+def frame_body(frame):
+    """Pack an OHLCV DataFrame into a compressed body and the header fields needed to unpack it"""
+    index = pd.DatetimeIndex(frame.index)
+    tz = str(index.tz) if index.tz is not None else None
+    timestamps = index.tz_convert("UTC").tz_localize(None) if tz else index
+    values = np.ascontiguousarray(frame.to_numpy(dtype=float))
+    raw = timestamps.as_unit("ns").asi8.astype("<i8").tobytes() + values.astype("<f8").tobytes()
+    return {"columns": [str(column) for column in frame.columns], "rows": len(frame), "tz": tz}, zlib.compress(raw)
+
+
+def body_frame(header, body):
+    """Unpack a history body back into the DataFrame it was recorded from"""
+    rows, columns = header["rows"], header["columns"]
+    raw = zlib.decompress(body)
+    timestamps = np.frombuffer(raw, dtype="<i8", count=rows)
+    values = np.frombuffer(raw, dtype="<f8", offset=rows * 8).reshape(rows, len(columns))
+    index = pd.to_datetime(timestamps, unit="ns")
+    if header["tz"]:
+        index = index.tz_localize("UTC").tz_convert(header["tz"])
+    return pd.DataFrame(values.copy(), index=index, columns=columns)
+
+
+def encode_record(header, frame=None):
+    body = b""
+    if frame is not None:
+        fields, body = frame_body(frame)
+        header = dict(header, **fields)
+    data = json.dumps(header, separators=(",", ":"), default=str).encode()
+    return _RECORD.pack(len(data), len(body)) + data + body
+
+
+def read_records(path):
+    """Yield (header, DataFrame or None) for every record of a recording file"""
+    with open(path, "rb") as f:
+        if f.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise ValueError(f"{path}: not a stock tracker recording")
+        while True:
+            prefix = f.read(_RECORD.size)
+            if len(prefix) < _RECORD.size:
+                return
+            header_length, body_length = _RECORD.unpack(prefix)
+            header = json.loads(f.read(header_length))
+            body = f.read(body_length)
+            if len(body) < body_length:
+                # A record cut short by a crash while recording
+                return
+            yield header, (body_frame(header, body) if "columns" in header else None)
+
+
+class RecordWriter:
+    """Appends records to a recording file, flushing each one so a crash loses at most the last"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.stream = open(path, "ab")
+        if new:
+            self.stream.write(RECORDING_MAGIC)
+            self.stream.flush()
+        self.records = 0
+
+    def write(self, header, frame=None):
+        data = encode_record(header, frame)
+        with self.lock:
+            self.stream.write(data)
+            self.stream.flush()
+            self.records += 1
+
+    def close(self):
+        with self.lock:
+            self.stream.close()
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from market_hours import is_open, next_close, next_open
+from utils import get_cache_dir
+
+# Slow-moving fields kept from the provider's info payload
+REFERENCE_FIELDS = ("previousClose", "currency", "shortName", "exchange", "fiftyTwoWeekHigh", "fiftyTwoWeekLow")
+
+
+def reference_expiry(exchange, now=None):
+    """
+    When cached reference data for an exchange goes stale.
+    previousClose only changes once the next session has closed, and
+    providers publish the new value by the following open. A value fetched
+    during a session lives until the first open after that session's close;
+    one fetched while the exchange is closed may still predate the rollover,
+    so it is refetched at the next open.
+    """
+    if not is_open(exchange, now):
+        return next_open(exchange, now)
+    return next_open(exchange, next_close(exchange, now))
+
+
+class ReferenceCache:
+    """
+    Per-symbol cache of previousClose and other slow-moving fields,
+    persisted as JSON so restarts don't have to refetch everything.
+    Expiry follows `clock`, or the provider's clock when none is given.
+    """
+
+    def __init__(self, path=None, clock=None):
+        self.path = path or os.path.join(get_cache_dir(), "reference.json")
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        """Load persisted entries, ignoring a missing or corrupt file"""
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """Write entries to disk if anything changed since the last save"""
+        with self.lock:
+            if not self.dirty:
+                return
+            snapshot = json.dumps(self.entries)
+            self.dirty = False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self.path)
+
+    def _key(self, provider, symbol):
+        return f"{provider.name}:{symbol}"
+
+    def get(self, symbol, exchange, provider):
+        """Return the reference fields for a symbol, refreshing them when expired"""
+        key = self._key(provider, symbol)
+        now = self.clock() if self.clock else provider.now()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and datetime.fromisoformat(entry["expires"]) > now:
+                self.hits += 1
+                return entry["fields"]
+            self.misses += 1
+
+        info = provider.info(symbol)
+        fields = {name: info[name] for name in REFERENCE_FIELDS if name in info}
+        if "previousClose" not in fields:
+            raise KeyError(f"previousClose missing from {symbol} info")
+        with self.lock:
+            self.entries[key] = {
+                "fields": fields,
+                "expires": reference_expiry(exchange, now).isoformat(),
+            }
+            self.dirty = True
+        return fields
+
+    def invalidate(self, symbol=None):
+        """Drop one symbol (or everything) so the next lookup refetches it"""
+        with self.lock:
+            if symbol is None:
+                self.entries.clear()
+            else:
+                for key in [k for k in self.entries if k.split(":", 1)[1] == symbol]:
+                    del self.entries[key]
+            self.dirty = True
+
+
+def set_reference_cache(cache):
+    """Replace the process-wide reference data cache"""
+    get_reference_cache.instance = cache
+    return cache
+
+
+def get_reference_cache():
+    """Get the process-wide reference data cache"""
+    if not hasattr(get_reference_cache, "instance"):
+        get_reference_cache.instance = ReferenceCache()
+    return get_reference_cache.instance
@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+
+# Attempts per call, including the first one
+DEFAULT_ATTEMPTS = 3
+
+# Backoff before retry n is a random delay up to min(MAX_DELAY, BASE_DELAY * 2**n) seconds
+DEFAULT_BASE_DELAY = 0.25
+DEFAULT_MAX_DELAY = 2.0
+
+# Consecutive failures that open a circuit, and seconds before it lets a trial call through
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 300
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call runs out of time before it could succeed"""
+
+
+def call_with_retries(fn, attempts=DEFAULT_ATTEMPTS, deadline=None, base_delay=DEFAULT_BASE_DELAY,
+                      max_delay=DEFAULT_MAX_DELAY, sleep=time.sleep):
+    """
+    Call fn() until it succeeds, retrying failures with full-jitter exponential backoff.
+    `deadline` is a time.monotonic() value; no retry is started that would end after it.
+    """
+    for attempt in range(attempts):
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceeded("Deadline passed before the call could be made")
+        try:
+            return fn()
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Per-key circuit breaker.
+    After `failure_threshold` consecutive failures a key's circuit opens and
+    calls for it are skipped; once `reset_timeout` seconds have passed a single
+    trial call is allowed, closing the circuit on success or reopening it on failure.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.opened_at = {}
+
+    def allow(self, key):
+        """Whether a call for this key may go ahead"""
+        with self.lock:
+            opened_at = self.opened_at.get(key)
+            if opened_at is None:
+                return True
+            if self.clock() - opened_at >= self.reset_timeout:
+                # Half-open: let one trial through and hold the rest until it reports back
+                self.opened_at[key] = self.clock()
+                return True
+            return False
+
+    def record_success(self, key):
+        with self.lock:
+            self.failures.pop(key, None)
+            self.opened_at.pop(key, None)
+
+    def record_failure(self, key):
+        with self.lock:
+            self.failures[key] = self.failures.get(key, 0) + 1
+            if self.failures[key] >= self.failure_threshold:
+                self.opened_at[key] = self.clock()
+
+    def open_keys(self):
+        with self.lock:
+            return sorted(self.opened_at)
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: `rate` tokens are added per second up to
+    `capacity`, and every call takes one, waiting for a refill when empty.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """Take tokens, sleeping until enough have accumulated"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+                self.waited += wait
+            self.sleep(wait)
+
+
+def get_circuit_breaker():
+    """Get the process-wide circuit breaker for ticker fetches"""
+    if not hasattr(get_circuit_breaker, "instance"):
+        get_circuit_breaker.instance = CircuitBreaker()
+    return get_circuit_breaker.instance
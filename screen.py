@@ -0,0 +1,143 @@
+import re
+import shutil
+import sys
+import threading
+import time
+
+from metrics import get_metrics
+
+# Frames drawn per second at most; intermediate frames are dropped
+DEFAULT_MAX_FPS = 4
+
+CLEAR_SCREEN = "\033[2J\033[H"
+ERASE_LINE = "\033[K"
+
+_ANSI_PATTERN = re.compile(r"\033\[[0-9;]*[A-Za-z]")
+
+
+def visible_width(text):
+    """Length of text as shown on screen, ignoring ANSI escape codes"""
+    return len(_ANSI_PATTERN.sub("", text))
+
+
+def move_to(row, col=0):
+    """Escape code moving the cursor to a zero-based row and column"""
+    return f"\033[{row + 1};{col + 1}H"
+
+
+def clear_screen(stream=None):
+    """Clear the terminal with escape codes instead of spawning a shell"""
+    stream = stream or sys.stdout
+    stream.write(CLEAR_SCREEN)
+    stream.flush()
+
+
+class ScreenRenderer:
+    """
+    Draws frames in place and only rewrites what changed since the last one.
+    A frame is a list of rows; a row is either a plain string or a tuple of
+    cells joined by single spaces. Changed plain rows are rewritten whole,
+    changed cells are rewritten on their own. Frames arriving faster than
+    `max_fps` are dropped unless forced, as are unforced frames taller than
+    the terminal. When the output is not a terminal only forced frames are
+    printed, as plain text.
+    """
+
+    def __init__(self, stream=None, max_fps=DEFAULT_MAX_FPS):
+        self.stream = stream or sys.stdout
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.interactive = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.lock = threading.Lock()
+        self.previous = None
+        self.last_draw = float("-inf")
+        self.frames_drawn = 0
+        self.frames_dropped = 0
+
+    def reset(self):
+        """Forget the previous frame so the next one redraws the whole screen"""
+        with self.lock:
+            self.previous = None
+
+    def due(self):
+        """Whether an unforced frame would be drawn now (lets callers skip building it)"""
+        with self.lock:
+            return self._due(time.monotonic())
+
+    def _due(self, now, rows=0):
+        return (self.interactive and now - self.last_draw >= self.min_interval
+                and rows < shutil.get_terminal_size().lines)
+
+    def render(self, frame, force=False):
+        """Draw a frame, returning False if it was dropped by the frame-rate cap"""
+        with self.lock:
+            now = time.monotonic()
+            if not force and not self._due(now, len(frame)):
+                self.frames_dropped += 1
+                return False
+            self.last_draw = now
+            self.frames_drawn += 1
+            with get_metrics().span("render"):
+                return self._draw(frame)
+
+    def _draw(self, frame):
+        if not self.interactive:
+            self.stream.write("\n".join(self._join(row) for row in frame) + "\n")
+            self.stream.flush()
+            return True
+
+        rows = [row if isinstance(row, str) else tuple(row) for row in frame]
+        if len(rows) >= shutil.get_terminal_size().lines:
+            # Taller than the terminal: cursor addressing can't reach scrolled rows,
+            # so print the frame in full and redraw from scratch next time
+            self.stream.write(CLEAR_SCREEN + "\n".join(self._join(row) for row in rows) + "\n")
+            self.previous = None
+        else:
+            self.stream.write(self._diff(self.previous, rows))
+            self.previous = rows
+        self.stream.flush()
+        return True
+
+    def _join(self, row):
+        return row if isinstance(row, str) else " ".join(row)
+
+    def _diff(self, previous, rows):
+        out = []
+        if previous is None:
+            out.append(CLEAR_SCREEN)
+            previous = []
+
+        for i, row in enumerate(rows):
+            old = previous[i] if i < len(previous) else None
+            if old == row:
+                continue
+            if isinstance(row, str) or isinstance(old, str) or old is None or len(old) != len(row):
+                out.append(move_to(i) + self._join(row) + ERASE_LINE)
+                continue
+
+            col = 0
+            for j, (old_cell, cell) in enumerate(zip(old, row)):
+                if cell != old_cell:
+                    if visible_width(cell) != visible_width(old_cell):
+                        # Everything to the right shifts, so rewrite the rest of the row
+                        out.append(move_to(i, col) + " ".join(row[j:]) + ERASE_LINE)
+                        break
+                    out.append(move_to(i, col) + cell)
+                col += visible_width(cell) + 1
+
+        for i in range(len(rows), len(previous)):
+            out.append(move_to(i) + ERASE_LINE)
+        out.append(move_to(len(rows)))
+        return "".join(out)
+
+
+def set_renderer(renderer):
+    """Replace the process-wide screen renderer"""
+    get_renderer.instance = renderer
+    return renderer
+
+
+def get_renderer():
+    """Get the process-wide screen renderer"""
+    if not hasattr(get_renderer, "instance"):
+        get_renderer.instance = ScreenRenderer()
+    return get_renderer.instance
@@ -1,17 +1,25 @@
-import os
 import time
 import threading
 import colorama
 from colorama import Fore, Style
+from startup import preload_ai_analytics
+from screen import clear_screen
 
 # Initialize colorama
 colorama.init()
 
 class Settings:
-    def __init__(self, threshold=5.0, interval=1, ai_enabled=False):
+    def __init__(self, threshold=5.0, interval=1, ai_enabled=False, workers=8, top_n=0, view_filter=None,
+                 batch_size=1, refresh_timeout=20.0, profile=False):
         self.threshold = threshold
         self.interval = interval
         self.ai_enabled = ai_enabled
+        self.workers = workers
+        self.top_n = top_n
+        self.view_filter = view_filter
+        self.batch_size = batch_size
+        self.refresh_timeout = refresh_timeout
+        self.profile = profile
         self.settings_changed = threading.Event()
         self.exit_requested = threading.Event()
         self.menu_active = False
@@ -19,7 +27,7 @@ class Settings:
 
     def display_current_settings(self):
         """Display the current settings"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        clear_screen()
         print(f"\n{Style.BRIGHT}{Fore.CYAN}=== STOCK TRACKER SETTINGS ==={Style.RESET_ALL}")
         print(f"1. Alert Threshold: {Fore.YELLOW}{self.threshold}%{Style.RESET_ALL}")
         print(f"2. Refresh Interval: {Fore.YELLOW}{self.interval} minute(s){Style.RESET_ALL}")
@@ -69,6 +77,9 @@ class Settings:
         with self.lock:
             self.ai_enabled = not self.ai_enabled
         status = "enabled" if self.ai_enabled else "disabled"
+        if self.ai_enabled:
+            # Start loading the analytics stack while the menu is still open
+            preload_ai_analytics()
         print(f"{Fore.GREEN}AI insights {status}{Style.RESET_ALL}")
         time.sleep(1)
 
@@ -106,12 +117,20 @@ class Settings:
         menu_thread.start()
         return menu_thread
 
-def get_settings_instance(initial_threshold=5.0, initial_interval=1, initial_ai=False):
+def get_settings_instance(initial_threshold=5.0, initial_interval=1, initial_ai=False, initial_workers=8,
+                          initial_top_n=0, initial_filter=None, initial_batch_size=1,
+                          initial_refresh_timeout=20.0, initial_profile=False):
     """Get a singleton instance of Settings"""
     if not hasattr(get_settings_instance, "instance"):
         get_settings_instance.instance = Settings(
             threshold=initial_threshold,
             interval=initial_interval,
-            ai_enabled=initial_ai
+            ai_enabled=initial_ai,
+            workers=initial_workers,
+            top_n=initial_top_n,
+            view_filter=initial_filter,
+            batch_size=initial_batch_size,
+            refresh_timeout=initial_refresh_timeout,
+            profile=initial_profile
         )
     return get_settings_instance.instance
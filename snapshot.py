@@ -0,0 +1,106 @@
+import numpy as np
+
+
+class Snapshot:
+    """
+    Columnar view of one refresh: one NumPy array per field plus a symbol index.
+    Ranking and filtering are vectorized; `to_quotes` turns
+    (a subset of) the rows back into the quote dicts the display and AI code use.
+    """
+
+    __slots__ = ("keys", "names", "tickers", "current", "change", "order", "vwap", "day_high", "day_low",
+                 "sparklines", "_index")
+
+    def __init__(self, keys, names, tickers, current, change, order, vwap=None, day_high=None, day_low=None,
+                 sparklines=None):
+        self.keys = keys
+        self.names = names
+        self.tickers = tickers
+        self.current = current
+        self.change = change
+        self.order = order
+        # Intraday session stats; NaN (or "") where a quote has none
+        nan = np.full(len(keys), np.nan)
+        self.vwap = nan if vwap is None else vwap
+        self.day_high = nan if day_high is None else day_high
+        self.day_low = nan if day_low is None else day_low
+        self.sparklines = np.full(len(keys), "", dtype=object) if sparklines is None else sparklines
+        self._index = None
+
+    @classmethod
+    def from_quotes(cls, quotes, watchlist=None):
+        """Build a snapshot from quote dicts; `watchlist` order breaks ranking ties"""
+        quotes = list(quotes)
+        positions = {key: position for position, key in enumerate(watchlist or ())}
+        fallback = len(positions)
+        return cls(
+            np.array([q["country"] for q in quotes], dtype=object),
+            np.array([q["index_name"] for q in quotes], dtype=object),
+            np.array([q.get("ticker", "") for q in quotes], dtype=object),
+            np.array([q["current_value"] for q in quotes], dtype=float),
+            np.array([q["percentage_change"] for q in quotes], dtype=float),
+            np.array([positions.get(q["country"], fallback) for q in quotes], dtype=np.int64),
+            np.array([q.get("vwap") for q in quotes], dtype=float),
+            np.array([q.get("day_high") for q in quotes], dtype=float),
+            np.array([q.get("day_low") for q in quotes], dtype=float),
+            np.array([q.get("sparkline", "") for q in quotes], dtype=object),
+        )
+
+    @staticmethod
+    def percent_change(current, previous_close):
+        """Vectorized daily change in percent, rounded like the quote dicts"""
+        current = np.asarray(current, dtype=float)
+        previous_close = np.asarray(previous_close, dtype=float)
+        return np.round((current - previous_close) / previous_close * 100, 2)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def take(self, rows):
+        """Return a new snapshot with only the given row positions (or boolean mask)"""
+        return Snapshot(self.keys[rows], self.names[rows], self.tickers[rows], self.current[rows],
+                        self.change[rows], self.order[rows], self.vwap[rows], self.day_high[rows],
+                        self.day_low[rows], self.sparklines[rows])
+
+    def ranked(self):
+        """Rows sorted by absolute change, largest first, ties in watchlist order"""
+        return self.take(np.lexsort((self.order, -np.abs(self.change))))
+
+    def matching(self, text):
+        """Rows whose key, name or ticker contains `text` (case-insensitive)"""
+        haystack = np.char.lower((self.keys + " " + self.names + " " + self.tickers).astype(str))
+        return self.take(np.char.find(haystack, text.lower()) >= 0)
+
+    def select(self, top_n=0, text_filter=None):
+        """The rows to show: optionally filtered by text, then the first `top_n`"""
+        view = self.matching(text_filter) if text_filter else self
+        return view.take(slice(0, top_n)) if top_n else view
+
+    def row(self, key):
+        """Position of a key or ticker in this snapshot, or None"""
+        if self._index is None:
+            self._index = {}
+            for position, (key_, ticker) in enumerate(zip(self.keys, self.tickers)):
+                self._index.setdefault(key_, position)
+                self._index.setdefault(ticker, position)
+        return self._index.get(key)
+
+    def to_quotes(self, limit=None):
+        """Adapter to the list-of-dicts format used by the display, alert and AI code"""
+        count = len(self) if limit is None else min(limit, len(self))
+        quotes = []
+        for i in range(count):
+            quote = {
+                "country": self.keys[i],
+                "index_name": self.names[i],
+                "ticker": self.tickers[i],
+                "current_value": float(self.current[i]),
+                "percentage_change": float(self.change[i]),
+            }
+            if not np.isnan(self.day_high[i]):
+                quote["vwap"] = None if np.isnan(self.vwap[i]) else float(self.vwap[i])
+                quote["day_high"] = float(self.day_high[i])
+                quote["day_low"] = float(self.day_low[i])
+                quote["sparkline"] = self.sparklines[i]
+            quotes.append(quote)
+        return quotes
@@ -0,0 +1,247 @@
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+# Where the server listens unless told otherwise; localhost only
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+# Messages buffered per client; a client that falls this far behind is dropped and resyncs on reconnect
+DEFAULT_CLIENT_QUEUE = 256
+
+# Seconds a viewer waits before reconnecting to a server that went away
+RECONNECT_DELAY = 2.0
+
+# Per-row columns of a snapshot record, in the order deltas carry them
+ROW_COLUMNS = ("names", "tickers", "values", "changes", "vwaps", "day_highs", "day_lows", "sparklines")
+
+
+def parse_address(address):
+    """
+    Turn "unix:/path", a filesystem path, "tcp:host:port", "host:port" or "port"
+    into (socket family, bind/connect address).
+    """
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    if "/" in address:
+        return socket.AF_UNIX, address
+    if address.startswith("tcp:"):
+        address = address[len("tcp:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def _rows(record):
+    # Records from servers that predate a column get it as nulls
+    empty = [None] * len(record["keys"])
+    return {key: list(row) for key, *row in zip(record["keys"], *(record.get(column, empty) for column in ROW_COLUMNS))}
+
+
+def full_message(record):
+    return dict(record, type="full")
+
+
+def delta_message(previous, record):
+    """
+    The changes from one snapshot record to the next: rows that are new or
+    changed, keys that disappeared, the new order, and insights that changed or disappeared.
+    """
+    old_rows, new_rows = _rows(previous), _rows(record)
+    message = {
+        "type": "delta",
+        "ts": record["ts"],
+        "seq": record["seq"],
+        "rows": {key: row for key, row in new_rows.items() if old_rows.get(key) != row},
+        "removed": [key for key in old_rows if key not in new_rows],
+    }
+    if record["keys"] != previous["keys"]:
+        message["order"] = record["keys"]
+    old_insights = previous.get("insights", {})
+    insights = {key: value for key, value in record.get("insights", {}).items() if old_insights.get(key) != value}
+    if insights:
+        message["insights"] = insights
+    insights_removed = [key for key in old_insights if key not in record.get("insights", {})]
+    if insights_removed:
+        message["insights_removed"] = insights_removed
+    for field in ("alerts", "skipped"):
+        if field in record:
+            message[field] = record[field]
+    return message
+
+
+def encode_message(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+class _Client:
+    """One subscriber: a bounded queue drained by its own sender thread"""
+
+    def __init__(self, connection, max_queue):
+        self.connection = connection
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closed = False
+        threading.Thread(target=self._send_loop, daemon=True).start()
+
+    def offer(self, data):
+        """Queue a message; returns False if the client is gone or too far behind"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except queue.Full:
+            self.close()
+            return False
+
+    def _send_loop(self):
+        while not self.closed:
+            data = self.queue.get()
+            if data is None:
+                break
+            try:
+                self.connection.sendall(data)
+            except OSError:
+                break
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+
+
+class SnapshotServer:
+    """
+    Publishes the snapshots of one fetch and insight pipeline to any number of
+    local viewers as newline-delimited JSON. A new subscriber gets the latest
+    full snapshot, then one delta per refresh; the delta is computed and encoded
+    once, so extra viewers cost only a socket write each.
+    Has the same write(record) method as SnapshotWriter, so headless mode can publish to it.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, max_queue=DEFAULT_CLIENT_QUEUE):
+        self.address = address
+        self.family, self.bind_address = parse_address(address)
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.latest = None
+        self.published = 0
+        self.sock = None
+
+    def start(self):
+        if self.family == socket.AF_UNIX and os.path.exists(self.bind_address):
+            os.remove(self.bind_address)
+        self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(self.bind_address)
+        self.sock.listen()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def _accept_loop(self):
+        while True:
+            try:
+                connection, _ = self.sock.accept()
+            except OSError:
+                return
+            client = _Client(connection, self.max_queue)
+            with self.lock:
+                if self.latest is not None:
+                    client.offer(encode_message(full_message(self.latest)))
+                self.clients.add(client)
+
+    def write(self, record):
+        """Publish a snapshot record to every subscriber"""
+        with self.lock:
+            previous, self.latest = self.latest, record
+            message = full_message(record) if previous is None else delta_message(previous, record)
+            data = encode_message(message)
+            self.clients = {client for client in self.clients if client.offer(data)}
+            self.published += 1
+
+    def close(self):
+        with self.lock:
+            for client in self.clients:
+                client.close()
+            self.clients.clear()
+        if self.sock is not None:
+            self.sock.close()
+            if self.family == socket.AF_UNIX and os.path.exists(self.bind_address):
+                os.remove(self.bind_address)
+
+
+def subscribe(address, reconnect_delay=RECONNECT_DELAY):
+    """Yield messages from a snapshot server, reconnecting (and so resyncing) whenever the connection drops"""
+    family, connect_address = parse_address(address)
+    while True:
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.connect(connect_address)
+                with sock.makefile("rb") as stream:
+                    for line in stream:
+                        yield json.loads(line)
+        except OSError:
+            pass
+        yield {"type": "disconnected"}
+        time.sleep(reconnect_delay)
+
+
+class SnapshotState:
+    """A viewer's copy of the server's latest snapshot, kept current by applying messages"""
+
+    def __init__(self):
+        self.rows = {}
+        self.order = []
+        self.insights = {}
+        self.alerts = []
+        self.skipped = {}
+        self.seq = None
+        self.connected = False
+
+    def apply(self, message):
+        kind = message["type"]
+        if kind == "disconnected":
+            self.connected = False
+            return
+        self.connected = True
+        if kind == "full":
+            self.rows = _rows(message)
+            self.order = list(message["keys"])
+            self.insights = dict(message.get("insights", {}))
+        else:
+            for key in message["removed"]:
+                self.rows.pop(key, None)
+                self.insights.pop(key, None)
+            for key in message.get("insights_removed", ()):
+                self.insights.pop(key, None)
+            self.rows.update(message["rows"])
+            self.order = message.get("order", self.order)
+            self.insights.update(message.get("insights", {}))
+        self.alerts = message.get("alerts", [])
+        self.skipped = message.get("skipped", {})
+        self.seq = message["seq"]
+
+    def to_quotes(self):
+        """The snapshot as quote dicts in the server's order"""
+        quotes = []
+        for key in self.order:
+            if key in self.rows:
+                name, ticker, value, change, vwap, day_high, day_low, sparkline = self.rows[key]
+                quote = {"country": key, "index_name": name, "ticker": ticker,
+                         "current_value": value, "percentage_change": change}
+                if day_high is not None:
+                    quote.update(vwap=vwap, day_high=day_high, day_low=day_low, sparkline=sparkline or "")
+                quotes.append(quote)
+        return quotes
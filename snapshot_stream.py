@@ -0,0 +1,176 @@
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import time
+
+# Output formats for headless mode
+FORMATS = ("jsonl", "binary")
+
+# Rotate the output file once it grows past this many bytes, keeping this many old files
+DEFAULT_ROTATE_BYTES = 64 * 2**20
+DEFAULT_BACKUPS = 5
+
+# Binary frame: u32 length of the rest, magic, timestamp, sequence number, row count,
+# then per row a u16-length-prefixed key and ticker (UTF-8) and two float64s (value, change)
+BINARY_MAGIC = b"STQ1"
+_HEADER = struct.Struct("<4sdQI")
+_LENGTH = struct.Struct("<I")
+_STRING = struct.Struct("<H")
+_VALUES = struct.Struct("<dd")
+
+
+def _insight_record(insight):
+    """The numeric parts of an AI insight, without headlines or display fields"""
+    record = {}
+    if "prediction" in insight:
+        record["prediction"] = insight["prediction"]
+    if "trend" in insight:
+        trend = insight["trend"]
+        record["trend"] = {"direction": trend["direction"], "strength": round(float(trend["strength"]), 4),
+                           "forecast": float(trend["forecast"])}
+    if "sentiment" in insight:
+        record["sentiment"] = {"score": insight["sentiment"]["score"], "strength": insight["sentiment"]["strength"]}
+    return record
+
+
+def _nullable(values):
+    """A float column as a list with None where the snapshot has NaN (JSON has no NaN)"""
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+def snapshot_record(snapshot, seq, timestamp=None, alerts=(), insights=None, skipped=None):
+    """
+    Build the compact, JSON-ready record of one refresh.
+    Quotes are stored column-wise straight from the Snapshot arrays; intraday
+    columns are null (or "" for sparklines) where a quote has no session stats.
+    """
+    record = {
+        "ts": round(time.time() if timestamp is None else timestamp, 3),
+        "seq": seq,
+        "keys": snapshot.keys.tolist(),
+        "names": snapshot.names.tolist(),
+        "tickers": snapshot.tickers.tolist(),
+        "values": snapshot.current.tolist(),
+        "changes": snapshot.change.tolist(),
+        "vwaps": _nullable(snapshot.vwap),
+        "day_highs": _nullable(snapshot.day_high),
+        "day_lows": _nullable(snapshot.day_low),
+        "sparklines": snapshot.sparklines.tolist(),
+    }
+    if alerts:
+        record["alerts"] = [{"rule": alert.rule_id, "key": alert.symbol, "kind": alert.kind,
+                             "threshold": alert.threshold, "change": alert.change} for alert in alerts]
+    if insights:
+        record["insights"] = {insight["country"]: _insight_record(insight) for insight in insights}
+    if skipped:
+        record["skipped"] = skipped
+    return record
+
+
+def encode_jsonl(record):
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode()
+
+
+def encode_binary(record):
+    """Pack the quote columns of a record into one length-prefixed binary frame (names, alerts and insights are not included)"""
+    parts = [_HEADER.pack(BINARY_MAGIC, record["ts"], record["seq"], len(record["keys"]))]
+    for key, ticker, value, change in zip(record["keys"], record["tickers"], record["values"], record["changes"]):
+        for text in (key, ticker):
+            data = text.encode()
+            parts.append(_STRING.pack(len(data)))
+            parts.append(data)
+        parts.append(_VALUES.pack(value, change))
+    body = b"".join(parts)
+    return _LENGTH.pack(len(body)) + body
+
+
+def decode_binary(frame):
+    """Unpack one binary frame body (without its length prefix) back into a record"""
+    magic, timestamp, seq, count = _HEADER.unpack_from(frame, 0)
+    if magic != BINARY_MAGIC:
+        raise ValueError("Not a stock tracker snapshot frame")
+    offset = _HEADER.size
+    record = {"ts": timestamp, "seq": seq, "keys": [], "tickers": [], "values": [], "changes": []}
+    for _ in range(count):
+        for column in ("keys", "tickers"):
+            (length,) = _STRING.unpack_from(frame, offset)
+            offset += _STRING.size
+            record[column].append(frame[offset:offset + length].decode())
+            offset += length
+        value, change = _VALUES.unpack_from(frame, offset)
+        offset += _VALUES.size
+        record["values"].append(value)
+        record["changes"].append(change)
+    return record
+
+
+def read_binary_frames(stream):
+    """Yield the records of a binary snapshot stream or file"""
+    while True:
+        prefix = stream.read(_LENGTH.size)
+        if len(prefix) < _LENGTH.size:
+            return
+        (length,) = _LENGTH.unpack(prefix)
+        yield decode_binary(stream.read(length))
+
+
+ENCODERS = {
+    "jsonl": encode_jsonl,
+    "binary": encode_binary,
+}
+
+
+class SnapshotWriter:
+    """
+    Writes encoded snapshot records to stdout ("-") or to a file that is
+    rotated like a log once it passes `rotate_bytes` (path, path.1, ... path.N).
+    """
+
+    def __init__(self, path="-", fmt="jsonl", rotate_bytes=DEFAULT_ROTATE_BYTES, backups=DEFAULT_BACKUPS):
+        if fmt not in ENCODERS:
+            raise ValueError(f"Unknown snapshot format: {fmt} (use one of {', '.join(FORMATS)})")
+        self.path = path
+        self.encode = ENCODERS[fmt]
+        self.rotate_bytes = rotate_bytes
+        self.backups = backups
+        self.lock = threading.Lock()
+        self.stream = None
+        self.written = 0
+
+    def _open(self):
+        if self.path == "-":
+            self.stream = sys.stdout.buffer
+        else:
+            self.stream = open(self.path, "ab")
+            self.written = self.stream.tell()
+
+    def _rotate(self):
+        self.stream.close()
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, record):
+        data = self.encode(record)
+        with self.lock:
+            if self.stream is None:
+                self._open()
+            if self.path != "-" and self.rotate_bytes and self.written and self.written + len(data) > self.rotate_bytes:
+                self._rotate()
+            self.stream.write(data)
+            self.stream.flush()
+            self.written += len(data)
+
+    def close(self):
+        with self.lock:
+            if self.stream is not None and self.path != "-":
+                self.stream.close()
+            self.stream = None
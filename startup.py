@@ -0,0 +1,51 @@
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+
+# Recorded (phase, seconds) pairs in the order they ran
+phases = []
+
+_ai_lock = threading.Lock()
+
+
+@contextmanager
+def phase(name):
+    """Time a startup phase (an import or initialisation step)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases.append((name, time.perf_counter() - start))
+
+
+def report():
+    """Format the recorded startup phases as a table"""
+    total = sum(seconds for _, seconds in phases)
+    width = max([len(name) for name, _ in phases] + [len("Total")])
+    lines = ["Startup profile:"]
+    for name, seconds in phases:
+        lines.append(f"  {name:<{width}}  {seconds * 1000:8.1f} ms")
+    lines.append(f"  {'Total':<{width}}  {total * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+
+def load_ai_analytics():
+    """
+    Import the analytics stack (pandas, scikit-learn, statsmodels, TextBlob) on first use.
+    Keeping it out of the module-level imports lets the quote-only path start quickly.
+    """
+    with _ai_lock:
+        module = getattr(load_ai_analytics, "module", None)
+        if module is None:
+            with phase("import ai_analytics"):
+                module = importlib.import_module("ai_analytics")
+            load_ai_analytics.module = module
+        return module
+
+
+def preload_ai_analytics():
+    """Start importing the analytics stack in the background (e.g. right after AI is toggled on)"""
+    thread = threading.Thread(target=load_ai_analytics, daemon=True)
+    thread.start()
+    return thread
@@ -1,49 +1,224 @@
-import yfinance as yf
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from intraday import get_intraday_store
+from market_hours import needs_refresh
+from metrics import get_metrics
+from providers import get_provider
+from reference_cache import get_reference_cache
+from resilience import call_with_retries, get_circuit_breaker
+from snapshot import Snapshot
+
+# Number of tickers fetched in parallel during a refresh
+DEFAULT_MAX_WORKERS = 8
+
+# Seconds one ticker may spend on its fetch, retries included
+DEFAULT_TICKER_TIMEOUT = 10.0
+
+# Hard upper bound in seconds on a whole refresh; unfinished tickers are skipped
+DEFAULT_REFRESH_TIMEOUT = 20.0
+
+# Tickers requested per multi-ticker history call
+DEFAULT_BATCH_SIZE = 1
 
 indices = {
     # North America
-    "USA": {"name": "S&P 500", "ticker": "^GSPC"},
-    "USA-NASDAQ": {"name": "NASDAQ", "ticker": "^IXIC"},
-    "USA-DOW": {"name": "Dow Jones", "ticker": "^DJI"},
-    "CANADA": {"name": "S&P/TSX", "ticker": "^GSPTSE"},
-    "MEXICO": {"name": "IPC", "ticker": "^MXX"},
+    "USA": {"name": "S&P 500", "ticker": "^GSPC", "exchange": "NYSE"},
+    "USA-NASDAQ": {"name": "NASDAQ", "ticker": "^IXIC", "exchange": "NYSE"},
+    "USA-DOW": {"name": "Dow Jones", "ticker": "^DJI", "exchange": "NYSE"},
+    "CANADA": {"name": "S&P/TSX", "ticker": "^GSPTSE", "exchange": "TSX"},
+    "MEXICO": {"name": "IPC", "ticker": "^MXX", "exchange": "BMV"},
     
     # Europe
-    "UK": {"name": "FTSE 100", "ticker": "^FTSE"},
-    "GERMANY": {"name": "DAX", "ticker": "^GDAXI"},
-    "FRANCE": {"name": "CAC 40", "ticker": "^FCHI"},
-    "SPAIN": {"name": "IBEX 35", "ticker": "^IBEX"},
-    "ITALY": {"name": "FTSE MIB", "ticker": "FTSEMIB.MI"},
-    "SWITZERLAND": {"name": "SMI", "ticker": "^SSMI"},
-    "NETHERLANDS": {"name": "AEX", "ticker": "^AEX"},
+    "UK": {"name": "FTSE 100", "ticker": "^FTSE", "exchange": "LSE"},
+    "GERMANY": {"name": "DAX", "ticker": "^GDAXI", "exchange": "XETRA"},
+    "FRANCE": {"name": "CAC 40", "ticker": "^FCHI", "exchange": "EURONEXT"},
+    "SPAIN": {"name": "IBEX 35", "ticker": "^IBEX", "exchange": "BME"},
+    "ITALY": {"name": "FTSE MIB", "ticker": "FTSEMIB.MI", "exchange": "MIL"},
+    "SWITZERLAND": {"name": "SMI", "ticker": "^SSMI", "exchange": "SIX"},
+    "NETHERLANDS": {"name": "AEX", "ticker": "^AEX", "exchange": "EURONEXT"},
     
     # Asia-Pacific
-    "JAPAN": {"name": "Nikkei 225", "ticker": "^N225"},
-    "CHINA": {"name": "Shanghai Composite", "ticker": "000001.SS"},
-    "CHINA-HK": {"name": "Hang Seng", "ticker": "^HSI"},
-    "SOUTH KOREA": {"name": "KOSPI", "ticker": "^KS11"},
-    "INDIA": {"name": "NIFTY 50", "ticker": "^NSEI"},
-    "AUSTRALIA": {"name": "ASX 200", "ticker": "^AXJO"},
-    "SINGAPORE": {"name": "STI", "ticker": "^STI"},
-    "BRAZIL": {"name": "Bovespa", "ticker": "^BVSP"},
+    "JAPAN": {"name": "Nikkei 225", "ticker": "^N225", "exchange": "TSE"},
+    "CHINA": {"name": "Shanghai Composite", "ticker": "000001.SS", "exchange": "SSE"},
+    "CHINA-HK": {"name": "Hang Seng", "ticker": "^HSI", "exchange": "HKEX"},
+    "SOUTH KOREA": {"name": "KOSPI", "ticker": "^KS11", "exchange": "KRX"},
+    "INDIA": {"name": "NIFTY 50", "ticker": "^NSEI", "exchange": "NSE"},
+    "AUSTRALIA": {"name": "ASX 200", "ticker": "^AXJO", "exchange": "ASX"},
+    "SINGAPORE": {"name": "STI", "ticker": "^STI", "exchange": "SGX"},
+    "BRAZIL": {"name": "Bovespa", "ticker": "^BVSP", "exchange": "B3"},
 }
 
-def fetch_indices_data():
-    print("Fetching global market data...")
-    data = []
+def quote_from_buffer(country, info, buffer, provider, reference_cache):
+    """Build a quote dict, with the session's VWAP, range and sparkline, from an intraday ring buffer"""
+    if buffer is None or not buffer.size:
+        return None
+    quote = quote_from_price(country, info, buffer.last_close, provider, reference_cache)
+    quote.update(buffer.stats())
+    return quote
+
+def quote_from_price(country, info, current_price, provider, reference_cache):
+    """Build a quote dict from the latest price and the cached previous close"""
+    reference = reference_cache.get(info["ticker"], info.get("exchange"), provider)
+    prev_close = reference['previousClose']
+    if not prev_close:
+        raise ValueError(f"previousClose of {info['ticker']} is {prev_close}")
+    return {
+        "country": country,
+        "index_name": info["name"],
+        "ticker": info["ticker"],
+        "current_value": round(current_price, 2),
+        "percentage_change": float(Snapshot.percent_change(current_price, prev_close)),
+    }
+
+# Last quote per country with the time it was fetched, for markets that are closed
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+class FetchReport:
+    """Indices left out of a refresh, with the reason for each"""
+
+    def __init__(self):
+        self.skipped = {}
+
+    def skip(self, country, reason):
+        self.skipped[country] = reason
+
+    def __bool__(self):
+        return bool(self.skipped)
+
+    def summary(self, limit=10):
+        items = [f"{country} ({reason})" for country, reason in self.skipped.items()]
+        if len(items) > limit:
+            items = items[:limit] + [f"{len(items) - limit} more"]
+        return ", ".join(items)
+
+def _fetch_batch(batch, provider, reference_cache, ticker_timeout, intraday):
+    """
+    Fetch one shard of the watchlist with a single multi-ticker history call,
+    asking only for 1-minute bars newer than those already in the intraday buffers.
+    Returns (country, quote or exception) for every entry of the batch.
+    """
+    metrics = get_metrics()
+    deadline = time.monotonic() + ticker_timeout
+    symbols = [info["ticker"] for _, info in batch]
+    exchanges = {info["ticker"]: info.get("exchange") for _, info in batch}
+    with metrics.span("fetch", symbols[0] if len(symbols) == 1 else None):
+        buffers = call_with_retries(lambda: intraday.update_many(symbols, exchanges, provider), deadline=deadline)
+    results = []
+    for country, info in batch:
+        try:
+            # Cold reference lookups hit the provider per ticker, so each gets its own budget
+            with metrics.span("info", info["ticker"]):
+                quote = call_with_retries(
+                    lambda: quote_from_buffer(country, info, buffers.get(info["ticker"]), provider, reference_cache),
+                    deadline=time.monotonic() + ticker_timeout)
+        except Exception as e:
+            results.append((country, e))
+            continue
+        if quote is not None:
+            with _snapshots_lock:
+                _snapshots[country] = (provider.now(), quote)
+        results.append((country, quote))
+    return results
+
+def iter_indices_data(provider=None, max_workers=DEFAULT_MAX_WORKERS, reference_cache=None, verbose=True,
+                      market_aware=False, report=None, ticker_timeout=DEFAULT_TICKER_TIMEOUT,
+                      refresh_timeout=DEFAULT_REFRESH_TIMEOUT, breaker=None, batch_size=DEFAULT_BATCH_SIZE,
+                      intraday=None):
+    """
+    Fetch quotes for every index in parallel, yielding each one as soon as it lands.
+    Quotes arrive in completion order; use sort_indices_data for the display order.
+    The watchlist is split into batches of `batch_size` tickers, each fetched with one
+    multi-ticker history call, so large watchlists cost few provider round trips.
+    With market_aware=True, indices whose exchange is closed are served from their
+    last snapshot unless the market has closed since it was taken.
+    Each batch is retried with jittered backoff within ticker_timeout, tickers that keep
+    failing are skipped by the circuit breaker, and the refresh stops waiting after
+    refresh_timeout. Skipped indices are recorded in `report` (a FetchReport).
+    """
+    if verbose:
+        print("Fetching global market data...")
+    provider = provider or get_provider()
+    reference_cache = reference_cache or get_reference_cache()
+    breaker = breaker or get_circuit_breaker()
+    intraday = intraday or get_intraday_store()
+    report = report if report is not None else FetchReport()
+    metrics = get_metrics()
+    refresh_deadline = time.monotonic() + refresh_timeout
+
+    pending = []
     for country, info in indices.items():
-        print(f"  Getting data for {country} - {info['name']}...")
-        ticker = yf.Ticker(info["ticker"])
-        hist = ticker.history(period="1d", interval="1m")
-        if not hist.empty:
-            current_price = hist['Close'].iloc[-1]
-            prev_close = ticker.info['previousClose']
-            pct_change = ((current_price - prev_close) / prev_close) * 100
-            data.append({
-                "country": country,
-                "index_name": info["name"],
-                "ticker": info["ticker"],
-                "current_value": round(current_price, 2),
-                "percentage_change": round(pct_change, 2),
-            })
-    return sorted(data, key=lambda x: abs(x['percentage_change']), reverse=True)
\ No newline at end of file
+        if market_aware:
+            with _snapshots_lock:
+                fetched_at, snapshot = _snapshots.get(country, (None, None))
+            if not needs_refresh(info.get("exchange"), fetched_at, provider.now()):
+                yield snapshot
+                continue
+        if not breaker.allow(info["ticker"]):
+            report.skip(country, "circuit open")
+            continue
+        if verbose:
+            print(f"  Getting data for {country} - {info['name']}...")
+        pending.append((country, info))
+
+    batch_size = max(1, batch_size)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {}
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            futures[executor.submit(_fetch_batch, batch, provider, reference_cache, ticker_timeout, intraday)] = batch
+        def settle(future, batch):
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [(country, e) for country, _ in batch]
+            for (country, info), (_, quote) in zip(batch, results):
+                if isinstance(quote, Exception):
+                    metrics.increment("provider_errors", reason="error")
+                    breaker.record_failure(info["ticker"])
+                    report.skip(country, f"error: {quote}")
+                    continue
+                breaker.record_success(info["ticker"])
+                if quote is None:
+                    report.skip(country, "no data")
+                else:
+                    yield quote
+
+        try:
+            for future in as_completed(futures, timeout=max(0.0, refresh_deadline - time.monotonic())):
+                yield from settle(future, futures.pop(future))
+        except TimeoutError:
+            for future, batch in futures.items():
+                if future.cancel():
+                    # Still waiting for a worker: says nothing about the tickers' health
+                    for country, _ in batch:
+                        report.skip(country, "not reached")
+                elif future.done():
+                    yield from settle(future, batch)
+                else:
+                    for country, info in batch:
+                        metrics.increment("provider_errors", reason="timeout")
+                        breaker.record_failure(info["ticker"])
+                        report.skip(country, "timed out")
+    finally:
+        # Don't wait for stragglers; their results are simply dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+    reference_cache.save()
+
+def snapshot_indices_data(data):
+    """Pack quotes into a columnar Snapshot ranked by absolute change, ties in watchlist order"""
+    return Snapshot.from_quotes(data, indices).ranked()
+
+def sort_indices_data(data):
+    """Sort quotes by absolute change, breaking ties in watchlist order"""
+    return snapshot_indices_data(data).to_quotes()
+
+def fetch_indices_data(provider=None, max_workers=DEFAULT_MAX_WORKERS, reference_cache=None, report=None, verbose=True):
+    """
+    Fetch quotes for every index in parallel.
+    Refresh latency is bounded by the slowest ticker rather than the sum of all of them,
+    and previousClose comes from the reference cache instead of a full info call.
+    """
+    return sort_indices_data(iter_indices_data(provider, max_workers, reference_cache, verbose=verbose, report=report))
@@ -0,0 +1,42 @@
+import json
+
+from snapshot import Snapshot
+from snapshot_server import SnapshotState, delta_message, full_message
+from snapshot_stream import snapshot_record
+
+
+def quote(country, value, change, vwap=None, day_high=None, day_low=None, sparkline=""):
+    q = {"country": country, "index_name": f"{country} index", "ticker": f"^{country}",
+         "current_value": value, "percentage_change": change}
+    if day_high is not None:
+        q.update(vwap=vwap, day_high=day_high, day_low=day_low, sparkline=sparkline)
+    return q
+
+
+def over_the_wire(message):
+    return json.loads(json.dumps(message, allow_nan=False))
+
+
+def test_intraday_fields_survive_full_and_delta_messages():
+    first = [quote("US", 100.0, 1.0, vwap=99.5, day_high=101.0, day_low=98.0, sparkline="▁▃▅"),
+             quote("UK", 50.0, -0.5)]
+    second = [quote("US", 101.0, 2.0, vwap=100.0, day_high=102.0, day_low=98.0, sparkline="▁▃▅█"),
+              quote("UK", 50.0, -0.5, vwap=None, day_high=51.0, day_low=49.0, sparkline="▂")]
+    records = [snapshot_record(Snapshot.from_quotes(quotes), seq) for seq, quotes in enumerate((first, second), 1)]
+
+    state = SnapshotState()
+    state.apply(over_the_wire(full_message(records[0])))
+    assert state.to_quotes() == first
+
+    state.apply(over_the_wire(delta_message(records[0], records[1])))
+    assert state.to_quotes() == second
+
+
+def test_record_from_older_server_without_intraday_columns():
+    record = snapshot_record(Snapshot.from_quotes([quote("US", 100.0, 1.0)]), 1)
+    for column in ("vwaps", "day_highs", "day_lows", "sparklines"):
+        del record[column]
+
+    state = SnapshotState()
+    state.apply(full_message(record))
+    assert state.to_quotes() == [quote("US", 100.0, 1.0)]
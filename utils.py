@@ -1,4 +1,12 @@
+import os
 from tabulate import tabulate
+from snapshot import Snapshot
+
+def get_cache_dir():
+    """Directory for on-disk caches (override with STOCK_TRACKER_CACHE)"""
+    path = os.environ.get("STOCK_TRACKER_CACHE") or os.path.join(os.path.expanduser("~"), ".cli_stock_tracker")
+    os.makedirs(path, exist_ok=True)
+    return path
 
 def display_indices_table(data):
     table = [[
@@ -6,4 +14,37 @@ def display_indices_table(data):
         f'{idx["percentage_change"]}% {"+" if idx["percentage_change"] >=0 else "-"}'
     ] for idx in data]
 
-    print(tabulate(table, headers=["Country", "Index", "Current Value", "% Change"], tablefmt="simple"))
\ No newline at end of file
+    print(tabulate(table, headers=["Country", "Index", "Current Value", "% Change"], tablefmt="simple"))
+
+def indices_header_rows():
+    """Column header rows for the live quote table"""
+    return [
+        (f"{'Country':<12}", f"{'Index':<20}", f"{'Current Value':>14}", f"{'% Change':<10}",
+         f"{'VWAP':>12}", f"{'Day Range':<23}", f"{'Intraday':<16}"),
+        ("-" * 12, "-" * 20, "-" * 14, "-" * 10, "-" * 12, "-" * 23, "-" * 16),
+    ]
+
+def index_row_cells(idx):
+    """Fixed-width cells of one live quote row"""
+    change = f'{idx["percentage_change"]}% {"+" if idx["percentage_change"] >=0 else "-"}'
+    vwap = idx.get("vwap") or ""
+    day_range = f'{idx["day_low"]} - {idx["day_high"]}' if "day_high" in idx else ""
+    return (f'{idx["country"]:<12}', f'{idx["index_name"]:<20}', f'{idx["current_value"]:>14}', f'{change:<10}',
+            f'{vwap:>12}', f'{day_range:<23}', f'{idx.get("sparkline", ""):<16}')
+
+
+def select_view(data, top_n=0, text_filter=None):
+    """
+    Narrow sorted quotes down to what fits on screen
+    text_filter keeps rows whose country, index name or ticker contains it (case-insensitive);
+    top_n keeps only the first N rows (0 shows everything).
+    A Snapshot is narrowed column-wise and stays a Snapshot.
+    """
+    if isinstance(data, Snapshot):
+        return data.select(top_n, text_filter)
+    if text_filter:
+        needle = text_filter.lower()
+        data = [idx for idx in data if needle in f'{idx["country"]} {idx["index_name"]} {idx.get("ticker", "")}'.lower()]
+    if top_n:
+        data = data[:top_n]
+    return data
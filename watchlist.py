@@ -0,0 +1,58 @@
+import csv
+import os
+
+from market_hours import DEFAULT_EXCHANGE
+
+
+def _entry(row, source):
+    ticker = (row.get("ticker") or "").strip()
+    if not ticker:
+        raise ValueError(f"{source}: every watchlist entry needs a ticker")
+    key = (row.get("key") or row.get("country") or ticker).strip()
+    return key, {
+        "name": (row.get("name") or ticker).strip(),
+        "ticker": ticker,
+        "exchange": (row.get("exchange") or DEFAULT_EXCHANGE).strip(),
+    }
+
+
+def load_watchlist(path):
+    """
+    Load a watchlist from a CSV or YAML file into the same shape as stock_fetcher.indices.
+    CSV files need a header with at least a `ticker` column; `key` (or `country`),
+    `name` and `exchange` are optional. YAML files hold a list of such mappings,
+    or a mapping of key to {name, ticker, exchange}.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="") as f:
+            rows = [row for row in csv.DictReader(f) if any((value or "").strip() for value in row.values())]
+    elif extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("YAML watchlists need PyYAML (pip install pyyaml)")
+        with open(path) as f:
+            document = yaml.safe_load(f) or []
+        if isinstance(document, dict):
+            rows = [dict(value, key=key) for key, value in document.items()]
+        else:
+            rows = document
+    else:
+        raise ValueError(f"Unsupported watchlist format: {path} (use .csv, .yaml or .yml)")
+
+    watchlist = {}
+    for row in rows:
+        key, entry = _entry({name: str(value) for name, value in row.items() if value is not None}, path)
+        watchlist[key] = entry
+    if not watchlist:
+        raise ValueError(f"{path}: watchlist is empty")
+    return watchlist
+
+
+def use_watchlist(watchlist):
+    """Replace the tracked indices in place, so modules holding a reference see the change"""
+    from stock_fetcher import indices
+    indices.clear()
+    indices.update(watchlist)
+    return indices